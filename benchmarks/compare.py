@@ -0,0 +1,38 @@
+import argparse
+import json
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(base, head):
+    rows = []
+    for key in sorted(set(base["summary"]) | set(head["summary"])):
+        before = base["summary"].get(key, {}).get("seconds")
+        after = head["summary"].get(key, {}).get("seconds")
+        ratio = after / before if before and after is not None else None
+        rows.append((key, before, after, ratio))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare deux resultats de benchmark")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    args = parser.parse_args(argv)
+
+    base, head = load(args.base), load(args.head)
+    print(f"{'stage:mode':<24}{base['commit']:>12}{head['commit']:>12}{'ratio':>8}")
+    for key, before, after, ratio in compare(base, head):
+        print(
+            f"{key:<24}"
+            f"{before if before is not None else '-':>12}"
+            f"{after if after is not None else '-':>12}"
+            f"{f'{ratio:.2f}' if ratio is not None else '-':>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger("benchmarks.generate")
+
+COLUMNS = [
+    "sale_date", "item_id", "sale_id", "product_id", "quantity", "original_price",
+    "unit_price", "discount_applied", "discount_percent", "discounted", "item_total",
+    "channel", "channel_campaigns", "total_amount", "product_name", "category", "brand",
+    "color", "size", "catalog_price", "cost_price", "customer_id", "gender", "age_range",
+    "signup_date", "first_name", "last_name", "email", "country",
+]
+
+LETTER_SIZES = ["XS", "S", "M", "L", "XL"]
+CATEGORIES = {
+    "T-Shirts": ("Tee", LETTER_SIZES),
+    "Dresses": ("Dress", LETTER_SIZES),
+    "Shoes": ("Shoes", ["35", "36", "37", "38", "39", "40"]),
+    "Sleepwear": ("Pyjamas", LETTER_SIZES),
+    "Pants": ("Trousers", LETTER_SIZES),
+}
+BRANDS = ["Tiva", "Nora", "Alba", "Kove", "Mira"]
+COLORS = ["Blue", "Green", "Black", "Red", "White", "Beige", "Grey", "Pink"]
+COUNTRIES = ["Germany", "France", "Italy", "Netherlands", "Spain", "Portugal", "Belgium", "Austria"]
+AGE_RANGES = ["16-25", "26-35", "36-45", "46-55", "56-65"]
+GENDERS = ["Female", "Male", "Other"]
+GENDER_WEIGHTS = [0.8, 0.17, 0.03]
+CHANNELS = {
+    "E-commerce": ["Website Banner", "Social Media", "Email"],
+    "App Mobile": ["App Mobile", "Social Media"],
+}
+DISCOUNTS = [0.0, 0.1, 0.3]
+DISCOUNT_WEIGHTS = [0.9, 0.03, 0.07]
+ADJECTIVES = ["Elegant", "Essential", "Modern", "Relaxed", "Classic", "Urban", "Soft", "Vintage"]
+STYLES = ["Satin", "Cotton", "Ribbed", "Boxy", "Crew", "Wrap", "Linen", "Oversized"]
+FIRST_NAMES = ["Dusty", "Jock", "Beale", "Anna", "Lena", "Marco", "Sofia", "Hugo", "Ines", "Lukas"]
+LAST_NAMES = ["Comerford", "Kellert", "Seeds", "Rossi", "Muller", "Dubois", "Silva", "Jansen"]
+
+
+def build_products(rng, n_products):
+    categories = rng.choice(list(CATEGORIES), n_products)
+    catalog_price = np.round(rng.normal(49.3, 13.0, n_products).clip(10, 120), 2)
+    names = [
+        f"{rng.choice(ADJECTIVES)} {rng.choice(STYLES)} {CATEGORIES[cat][0]}"
+        for cat in categories
+    ]
+    sizes = [rng.choice(CATEGORIES[cat][1]) for cat in categories]
+    return pd.DataFrame({
+        "product_id": np.arange(1, n_products + 1),
+        "product_name": names,
+        "category": categories,
+        "brand": rng.choice(BRANDS, n_products, p=[0.6, 0.1, 0.1, 0.1, 0.1]),
+        "color": rng.choice(COLORS, n_products),
+        "size": sizes,
+        "catalog_price": catalog_price,
+        "cost_price": np.round(catalog_price * rng.uniform(0.4, 0.65, n_products), 2),
+    })
+
+
+def build_customers(rng, n_customers, start_date):
+    first = rng.choice(FIRST_NAMES, n_customers)
+    last = rng.choice(LAST_NAMES, n_customers)
+    ids = np.arange(1, n_customers + 1)
+    emails = pd.Series([f"{f[0]}{l}{i}@example.com".lower() for f, l, i in zip(first, last, ids)])
+    signup = pd.to_datetime(start_date) - pd.to_timedelta(rng.integers(1, 365, n_customers), unit="D")
+    customers = pd.DataFrame({
+        "customer_id": ids,
+        "gender": rng.choice(GENDERS, n_customers, p=GENDER_WEIGHTS),
+        "age_range": rng.choice(AGE_RANGES, n_customers),
+        "signup_date": signup.strftime("%Y-%m-%d"),
+        "first_name": first,
+        "last_name": last,
+        "email": emails,
+        "country": rng.choice(COUNTRIES, n_customers, p=[0.24, 0.22, 0.18, 0.14, 0.12, 0.06, 0.02, 0.02]),
+    })
+    # Same share of missing personal fields as the reference file
+    customers.loc[rng.random(n_customers) < 0.05, "first_name"] = None
+    customers.loc[rng.random(n_customers) < 0.10, "email"] = None
+    return customers
+
+
+def generate_chunk(rng, products, customers, n_items, first_item_id, first_sale_id, start_date, days):
+    items_per_sale = rng.integers(1, 6, n_items)
+    sale_of_item = np.repeat(np.arange(len(items_per_sale)), items_per_sale)[:n_items]
+    n_sales = sale_of_item[-1] + 1
+
+    sale_dates = pd.to_datetime(start_date) + pd.to_timedelta(rng.integers(0, days, n_sales), unit="D")
+    sale_channels = rng.choice(list(CHANNELS), n_sales)
+    sale_campaigns = np.array([rng.choice(CHANNELS[ch]) for ch in sale_channels])
+    sale_customers = rng.integers(0, len(customers), n_sales)
+
+    product_idx = rng.integers(0, len(products), n_items)
+    df = products.iloc[product_idx].reset_index(drop=True)
+    df = pd.concat([df, customers.iloc[sale_customers[sale_of_item]].reset_index(drop=True)], axis=1)
+
+    df["sale_date"] = sale_dates[sale_of_item].strftime("%Y-%m-%d")
+    df["item_id"] = np.arange(first_item_id, first_item_id + n_items)
+    df["sale_id"] = first_sale_id + sale_of_item
+    df["quantity"] = rng.integers(1, 6, n_items)
+    df["original_price"] = df["catalog_price"]
+    pct = rng.choice(DISCOUNTS, n_items, p=DISCOUNT_WEIGHTS)
+    df["discount_applied"] = np.round(df["original_price"] * pct, 2)
+    df["unit_price"] = np.round(df["original_price"] - df["discount_applied"], 2)
+    df["discount_percent"] = [f"{p * 100:.2f}%" for p in pct]
+    df["discounted"] = (pct > 0).astype(int)
+    df["item_total"] = np.round(df["quantity"] * df["unit_price"], 2)
+    df["channel"] = sale_channels[sale_of_item]
+    df["channel_campaigns"] = sale_campaigns[sale_of_item]
+    df["total_amount"] = np.round(df.groupby("sale_id")["item_total"].transform("sum"), 2)
+    df.loc[rng.random(n_items) < 0.1, "total_amount"] = np.nan
+
+    return df[COLUMNS], int(n_sales)
+
+
+def generate(output, rows, days, start_date, n_customers=None, n_products=None,
+             chunk_size=1_000_000, seed=42):
+    rng = np.random.default_rng(seed)
+    n_customers = n_customers or max(100, rows // 4)
+    n_products = n_products or max(50, min(rows // 5, 200_000))
+
+    products = build_products(rng, n_products)
+    customers = build_customers(rng, n_customers, start_date)
+    logger.info(f"{n_products} products, {n_customers} customers, {days} days from {start_date}")
+
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    written, next_sale_id = 0, 1
+    while written < rows:
+        n_items = min(chunk_size, rows - written)
+        chunk, n_sales = generate_chunk(
+            rng, products, customers, n_items, written + 1, next_sale_id, start_date, days
+        )
+        chunk.to_csv(output, mode="w" if written == 0 else "a", header=written == 0, index=False)
+        written += n_items
+        next_sale_id += n_sales
+        logger.info(f"{written}/{rows} rows written")
+
+    return output
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generation de ventes synthetiques (schema 29 colonnes)")
+    parser.add_argument("--rows", type=int, default=100_000, help="Nombre d'articles a generer")
+    parser.add_argument("--days", type=int, default=90, help="Nombre de jours couverts")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(2025, 4, 4))
+    parser.add_argument("--customers", type=int, default=None, help="Defaut: rows / 4")
+    parser.add_argument("--products", type=int, default=None, help="Defaut: rows / 5, max 200000")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=os.path.join("data", "bench", "fashion_store_sales.csv"))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    generate(
+        args.output, args.rows, args.days, args.start_date,
+        n_customers=args.customers, n_products=args.products,
+        chunk_size=args.chunk_size, seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import argparse
+import gzip
+import json
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from src.ingestion.dimension_cache import get_dimension_cache
+from src.ingestion.minio_client import get_s3_client, read_csv_object, read_source
+from src.ingestion.postgres_loader import LOAD_MODES, get_connection, load_to_postgres
+from src.ingestion.transformer import transform_and_split
+from src.utils.logger import setup_logger
+from src.utils.metrics import current_rss_bytes
+
+logger = setup_logger("benchmarks.run")
+
+RESET_SQL = (
+    "TRUNCATE sale_items, sales, customers, products, channels, countries, categories, "
+    "brands, colors, sizes, age_ranges, fact_sale_items, fact_sale_totals, daily_sales_rollup, "
+    "product_price_history, ingestion_manifest, load_checkpoints, rejected_rows, star_date_changes "
+    "RESTART IDENTITY CASCADE"
+)
+
+# Suffix of the compressed copy uploaded for each codec
+CODECS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+QUERIES = {
+    "query": "SELECT count(*), sum(item_total) FROM v_star_schema WHERE sale_date = %s",
+    "query_fact": "SELECT count(*), sum(item_total) FROM fact_sale_items WHERE sale_date = %s",
+}
+
+
+RSS_SAMPLE_SECONDS = 0.005
+
+
+def process_peak_rss_mb():
+    # ru_maxrss only grows: the largest peak of any stage run so far
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RssSampler:
+    # Peak of the current RSS while one stage runs, sampled on a thread
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak = current_rss_bytes() or 0
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+
+    def sample(self):
+        while not self.stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes() or 0)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss_bytes() or 0)
+
+    def peak_mb(self):
+        return self.peak / 2 ** 20
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class StageRecorder:
+    def __init__(self):
+        self.records = []
+
+    def run(self, stage, fn, rows_in=None, **labels):
+        with RssSampler() as rss:
+            start = time.perf_counter()
+            result = fn()
+            seconds = time.perf_counter() - start
+        rows = rows_in if rows_in is not None else (len(result) if hasattr(result, "__len__") else 0)
+        record = {
+            "stage": stage,
+            "seconds": round(seconds, 4),
+            "rows": rows,
+            "rows_per_s": round(rows / seconds, 1) if seconds > 0 else None,
+            "peak_rss_mb": round(rss.peak_mb(), 1),
+            "process_peak_rss_mb": round(process_peak_rss_mb(), 1),
+            **labels,
+        }
+        self.records.append(record)
+        logger.info(f"{stage} {labels}: {seconds:.3f}s, {rows} rows")
+        return result
+
+    def summary(self):
+        summary = {}
+        for record in self.records:
+            key = f"{record['stage']}:{record.get('mode', record.get('codec', '-'))}"
+            entry = summary.setdefault(key, {"seconds": 0.0, "rows": 0})
+            entry["seconds"] += record["seconds"]
+            entry["rows"] += record["rows"]
+        for entry in summary.values():
+            entry["seconds"] = round(entry["seconds"], 4)
+            entry["rows_per_s"] = round(entry["rows"] / entry["seconds"], 1) if entry["seconds"] else None
+        return summary
+
+
+def reset_database():
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(RESET_SQL)
+        conn.commit()
+    finally:
+        conn.close()
+    get_dimension_cache.cache_clear()
+
+
+def run_query(sql, day):
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql, (day,))
+            return cur.fetchone()
+    finally:
+        conn.close()
+
+
+def compress_file(path, codec, directory):
+    if codec == "none":
+        return path
+    target = os.path.join(directory, os.path.basename(path) + CODECS[codec])
+    with open(path, "rb") as src, open(target, "wb") as dst:
+        if codec == "gzip":
+            with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=6) as out:
+                shutil.copyfileobj(src, out, 1 << 20)
+        else:
+            import zstandard
+
+            zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+    return target
+
+
+def run_codecs(s3, args, recorder, day):
+    # Same CSV per codec: transfer size versus download + decompress + parse time
+    with tempfile.TemporaryDirectory() as directory:
+        for codec in args.codecs:
+            path = recorder.run(
+                "compress", lambda: compress_file(args.csv, codec, directory), rows_in=0, codec=codec
+            )
+            key = args.key + CODECS[codec]
+            size = os.path.getsize(path)
+            recorder.run(
+                "upload", lambda: s3.upload_file(path, args.bucket, key), rows_in=0, codec=codec, bytes=size
+            )
+            recorder.run(
+                "parse", lambda: read_csv_object(s3, args.bucket, key, day), codec=codec, bytes=size
+            )
+
+
+def run_benchmark(args):
+    s3 = get_s3_client()
+    recorder = StageRecorder()
+
+    if args.csv:
+        size = os.path.getsize(args.csv)
+        recorder.run(
+            "upload",
+            lambda: s3.upload_file(args.csv, args.bucket, args.key),
+            rows_in=0,
+            bytes=size,
+        )
+
+    object_size = s3.head_object(Bucket=args.bucket, Key=args.key)["ContentLength"]
+    days = [args.start_date + timedelta(days=i) for i in range(args.days)]
+
+    if args.codecs:
+        run_codecs(s3, args, recorder, days[0])
+
+    for mode in args.load_modes:
+        if args.reset:
+            reset_database()
+        for day in days:
+            labels = {"date": day.isoformat(), "mode": mode}
+            df = recorder.run(
+                "extract",
+                lambda: read_source(s3, args.bucket, args.key, day),
+                bytes=object_size,
+                **labels,
+            )
+            tables = recorder.run(
+                "transform",
+                lambda: transform_and_split(df, day),
+                rows_in=len(df),
+                **labels,
+            )
+            if tables is None:
+                continue
+            recorder.run(
+                "load",
+                lambda: load_to_postgres(tables, mode=mode),
+                rows_in=len(tables["sale_items"]),
+                **labels,
+            )
+            for stage, sql in QUERIES.items():
+                recorder.run(
+                    stage,
+                    lambda: run_query(sql, day),
+                    rows_in=len(tables["sale_items"]),
+                    **labels,
+                )
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            "bucket": args.bucket,
+            "key": args.key,
+            "object_bytes": object_size,
+            "start_date": args.start_date.isoformat(),
+            "days": args.days,
+            "load_modes": args.load_modes,
+            "codecs": args.codecs,
+        },
+        "stages": recorder.records,
+        "summary": recorder.summary(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extract / transform / load")
+    parser.add_argument("--csv", help="CSV local a uploader dans Minio avant le benchmark")
+    parser.add_argument("--bucket", default=os.getenv("MINIO_BUCKET", "folder-source"))
+    parser.add_argument("--key", default="bench/fashion_store_sales.csv")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(2025, 4, 4))
+    parser.add_argument("--days", type=int, default=3, help="Nombre de jours a ingerer")
+    parser.add_argument(
+        "--load-modes",
+        type=lambda value: value.split(","),
+        default=["copy"],
+        help=f"Modes de chargement separes par des virgules ({', '.join(LOAD_MODES)})",
+    )
+    parser.add_argument(
+        "--codecs",
+        type=lambda value: value.split(","),
+        default=[],
+        help=f"Compare la lecture du CSV compresse ({', '.join(CODECS)}), necessite --csv",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Vide les tables DKNF avant chaque mode (base de test uniquement)",
+    )
+    parser.add_argument("--output-dir", default=os.path.join("benchmarks", "results"))
+    args = parser.parse_args(argv)
+    for mode in args.load_modes:
+        if mode not in LOAD_MODES:
+            parser.error(f"Mode inconnu: {mode}")
+    for codec in args.codecs:
+        if codec not in CODECS:
+            parser.error(f"Codec inconnu: {codec}")
+    if args.codecs and not args.csv:
+        parser.error("--codecs necessite --csv")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmark(args)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(
+        args.output_dir,
+        f"{datetime.now():%Y%m%dT%H%M%S}_{results['commit']}.json",
+    )
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Results written to {path}")
+
+    for key, entry in results["summary"].items():
+        logger.info(f"{key}: {entry['seconds']}s, {entry['rows']} rows, {entry['rows_per_s']} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -58,18 +58,32 @@ CREATE TABLE products (
     cost_price    NUMERIC(10, 2) NOT NULL
 );
 
+-- sales and sale_items are range-partitioned by month on sale_date, so the
+-- partition key is part of their keys and sale_items carries the date of its
+-- sale. Partitions are created by create_sales_partitions() (05_partition_sales.sql).
 CREATE TABLE sales (
-    sale_id     INTEGER PRIMARY KEY,
+    sale_id     INTEGER NOT NULL,
     sale_date   DATE NOT NULL,
     customer_id INTEGER NOT NULL REFERENCES customers(customer_id),
-    channel_id  INTEGER NOT NULL REFERENCES channels(channel_id)
-);
+    channel_id  INTEGER NOT NULL REFERENCES channels(channel_id),
+    PRIMARY KEY (sale_id, sale_date)
+) PARTITION BY RANGE (sale_date);
 
 CREATE TABLE sale_items (
-    item_id          INTEGER PRIMARY KEY,
-    sale_id          INTEGER NOT NULL REFERENCES sales(sale_id),
+    item_id          INTEGER NOT NULL,
+    sale_id          INTEGER NOT NULL,
+    sale_date        DATE NOT NULL,
     product_id       INTEGER NOT NULL REFERENCES products(product_id),
     quantity         INTEGER NOT NULL CHECK (quantity > 0),
     original_price   NUMERIC(10, 2) NOT NULL,
-    discount_applied NUMERIC(10, 2) NOT NULL DEFAULT 0.00
-);
+    discount_applied NUMERIC(10, 2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (item_id, sale_date),
+    FOREIGN KEY (sale_id, sale_date) REFERENCES sales(sale_id, sale_date)
+) PARTITION BY RANGE (sale_date);
+
+-- Declared on the parents, so every partition gets its own copy
+CREATE INDEX idx_sales_sale_date ON sales (sale_date);
+CREATE INDEX idx_sales_customer_id ON sales (customer_id);
+CREATE INDEX idx_sales_channel_id ON sales (channel_id);
+CREATE INDEX idx_sale_items_sale_id ON sale_items (sale_id, sale_date);
+CREATE INDEX idx_sale_items_product_id ON sale_items (product_id);
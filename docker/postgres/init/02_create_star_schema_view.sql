@@ -33,7 +33,7 @@ SELECT
     (si.original_price - si.discount_applied) AS unit_price,
     (si.quantity * (si.original_price - si.discount_applied)) AS item_total
 FROM sale_items si
-JOIN sales s ON si.sale_id = s.sale_id
+JOIN sales s ON si.sale_id = s.sale_id AND si.sale_date = s.sale_date
 JOIN customers c ON s.customer_id = c.customer_id
 JOIN products p ON si.product_id = p.product_id
 JOIN channels ch ON s.channel_id = ch.channel_id
@@ -47,6 +47,7 @@ JOIN sizes sz ON p.size_id = sz.size_id;
 CREATE OR REPLACE VIEW v_sale_totals AS
 SELECT
     sale_id,
+    sale_date,
     SUM(quantity * (original_price - discount_applied)) AS total_amount
 FROM sale_items
-GROUP BY sale_id;
+GROUP BY sale_id, sale_date;
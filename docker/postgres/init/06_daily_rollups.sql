@@ -0,0 +1,35 @@
+-- Daily business aggregates, refreshed by the loader from fact_sale_items for
+-- the dates it ingests. Measures are additive: any coarser grouping or date
+-- range is a SUM over these rows (see src/analytics/rollups.py).
+CREATE TABLE IF NOT EXISTS daily_sales_rollup (
+    sale_date       DATE NOT NULL,
+    channel         VARCHAR(50) NOT NULL,
+    category        VARCHAR(100) NOT NULL,
+    country         VARCHAR(100) NOT NULL,
+    items           INTEGER NOT NULL,
+    units           INTEGER NOT NULL,
+    gross_amount    NUMERIC NOT NULL,
+    discount_amount NUMERIC NOT NULL,
+    revenue         NUMERIC NOT NULL,
+    catalog_amount  NUMERIC NOT NULL,
+    cost_amount     NUMERIC NOT NULL,
+    PRIMARY KEY (sale_date, channel, category, country)
+);
+
+-- Initial fill for databases that already hold sales
+INSERT INTO daily_sales_rollup (
+    sale_date, channel, category, country,
+    items, units, gross_amount, discount_amount, revenue, catalog_amount, cost_amount
+)
+SELECT
+    sale_date, channel, category, country,
+    count(*),
+    SUM(quantity),
+    SUM(quantity * original_price),
+    SUM(quantity * discount_applied),
+    SUM(item_total),
+    SUM(quantity * catalog_price),
+    SUM(quantity * cost_price)
+FROM fact_sale_items
+GROUP BY sale_date, channel, category, country
+ON CONFLICT (sale_date, channel, category, country) DO NOTHING;
@@ -0,0 +1,12 @@
+-- One row per (date, source object) loaded, written in the load transaction.
+-- A run whose object still has the recorded ETag skips the date.
+CREATE TABLE IF NOT EXISTS ingestion_manifest (
+    sale_date  DATE NOT NULL,
+    bucket     VARCHAR(255) NOT NULL,
+    source_key VARCHAR(1024) NOT NULL,
+    etag       VARCHAR(255) NOT NULL,
+    sales      INTEGER NOT NULL,
+    sale_items INTEGER NOT NULL,
+    loaded_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (bucket, source_key, sale_date)
+);
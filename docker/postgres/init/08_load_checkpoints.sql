@@ -0,0 +1,12 @@
+-- Batches of a chunked load (PG_LOAD_MODE=chunked) already committed to its
+-- staging tables. A retried load skips them; rows go away on publish.
+-- Chunk -1 marks a started load. Loads idle for PG_CHUNK_RETENTION_DAYS are
+-- dropped, with their staging tables, by the next chunked load.
+CREATE TABLE IF NOT EXISTS load_checkpoints (
+    load_key   VARCHAR(32) NOT NULL,
+    table_name VARCHAR(64) NOT NULL,
+    chunk      INTEGER NOT NULL,
+    row_count  INTEGER NOT NULL,
+    loaded_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (load_key, table_name, chunk)
+);
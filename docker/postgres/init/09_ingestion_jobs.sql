@@ -0,0 +1,36 @@
+-- Job queue of the long-running worker (python -m src.worker). Inserting a
+-- row notifies the workers listening on the ingestion_jobs channel.
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    job_id      BIGSERIAL PRIMARY KEY,
+    sale_dates  DATE[] NOT NULL,
+    source_key  VARCHAR(1024),
+    load_mode   VARCHAR(16),
+    force       BOOLEAN NOT NULL DEFAULT false,
+    status      VARCHAR(16) NOT NULL DEFAULT 'queued'
+                CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    rows_loaded INTEGER,
+    error       TEXT,
+    queued_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at  TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+-- Renewed by the worker running the job; a running job whose heartbeat is
+-- older than the lease (WORKER_LEASE_SECONDS) is claimed again.
+ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_queued ON ingestion_jobs (job_id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_running ON ingestion_jobs (heartbeat_at) WHERE status = 'running';
+
+CREATE OR REPLACE FUNCTION notify_ingestion_job() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('ingestion_jobs', NEW.job_id::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notify_ingestion_job ON ingestion_jobs;
+CREATE TRIGGER trg_notify_ingestion_job
+    AFTER INSERT ON ingestion_jobs
+    FOR EACH ROW EXECUTE FUNCTION notify_ingestion_job();
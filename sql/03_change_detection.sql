@@ -0,0 +1,10 @@
+ALTER TABLE customers ADD COLUMN IF NOT EXISTS row_hash CHAR(32);
+ALTER TABLE products ADD COLUMN IF NOT EXISTS row_hash CHAR(32);
+
+CREATE TABLE IF NOT EXISTS product_price_history (
+    product_id    INTEGER NOT NULL REFERENCES products(product_id),
+    catalog_price NUMERIC(10, 2) NOT NULL,
+    cost_price    NUMERIC(10, 2) NOT NULL,
+    valid_until   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (product_id, valid_until)
+);
@@ -0,0 +1,72 @@
+-- Materialized copies of v_star_schema and v_sale_totals, refreshed by the
+-- loader for the dates it ingests (same transaction as the load).
+
+-- Same columns, in the same order, as v_star_schema
+CREATE TABLE IF NOT EXISTS fact_sale_items (
+    item_id           INTEGER NOT NULL,
+    sale_id           INTEGER NOT NULL,
+    sale_date         DATE NOT NULL,
+
+    customer_id       INTEGER NOT NULL,
+    first_name        VARCHAR(100),
+    last_name         VARCHAR(100),
+    email             VARCHAR(255),
+    gender            gender_enum,
+    age_range         VARCHAR(20) NOT NULL,
+    signup_date       DATE,
+    country           VARCHAR(100) NOT NULL,
+
+    product_id        INTEGER NOT NULL,
+    product_name      VARCHAR(255) NOT NULL,
+    category          VARCHAR(100) NOT NULL,
+    brand             VARCHAR(100) NOT NULL,
+    color             VARCHAR(50) NOT NULL,
+    size              VARCHAR(10) NOT NULL,
+    catalog_price     NUMERIC(10, 2) NOT NULL,
+    cost_price        NUMERIC(10, 2) NOT NULL,
+
+    channel           VARCHAR(50) NOT NULL,
+    channel_campaigns VARCHAR(100),
+
+    quantity          INTEGER NOT NULL,
+    original_price    NUMERIC(10, 2) NOT NULL,
+    discount_applied  NUMERIC(10, 2) NOT NULL,
+    discounted        INTEGER NOT NULL,
+    discount_percent  NUMERIC,
+    unit_price        NUMERIC NOT NULL,
+    item_total        NUMERIC NOT NULL,
+
+    -- Ids are unique per date only, like the keys of sales / sale_items
+    PRIMARY KEY (item_id, sale_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fact_sale_items_sale_date ON fact_sale_items (sale_date);
+CREATE INDEX IF NOT EXISTS idx_fact_sale_items_channel ON fact_sale_items (channel, sale_date);
+CREATE INDEX IF NOT EXISTS idx_fact_sale_items_category ON fact_sale_items (category, sale_date);
+CREATE INDEX IF NOT EXISTS idx_fact_sale_items_country ON fact_sale_items (country, sale_date);
+CREATE INDEX IF NOT EXISTS idx_fact_sale_items_customer ON fact_sale_items (customer_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sale_items_product ON fact_sale_items (product_id);
+
+CREATE TABLE IF NOT EXISTS fact_sale_totals (
+    sale_id      INTEGER NOT NULL,
+    sale_date    DATE NOT NULL,
+    customer_id  INTEGER NOT NULL,
+    channel      VARCHAR(50) NOT NULL,
+    item_count   INTEGER NOT NULL,
+    total_amount NUMERIC NOT NULL,
+    PRIMARY KEY (sale_id, sale_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fact_sale_totals_sale_date ON fact_sale_totals (sale_date);
+CREATE INDEX IF NOT EXISTS idx_fact_sale_totals_customer ON fact_sale_totals (customer_id);
+
+-- Initial fill for databases that already hold sales
+INSERT INTO fact_sale_items
+SELECT * FROM v_star_schema
+ON CONFLICT (item_id, sale_date) DO NOTHING;
+
+INSERT INTO fact_sale_totals (sale_id, sale_date, customer_id, channel, item_count, total_amount)
+SELECT sale_id, sale_date, customer_id, channel, count(*), SUM(item_total)
+FROM fact_sale_items
+GROUP BY sale_id, sale_date, customer_id, channel
+ON CONFLICT (sale_id, sale_date) DO NOTHING;
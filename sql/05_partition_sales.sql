@@ -0,0 +1,164 @@
+-- Monthly partitions of sales and sale_items, created on demand by the loader
+-- before it writes a date. The advisory lock serializes concurrent loaders
+-- creating the same month.
+CREATE OR REPLACE FUNCTION create_sales_partitions(days DATE[])
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    suffix      TEXT;
+    parent      TEXT;
+    created     INTEGER := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('create_sales_partitions'));
+
+    FOR month_start IN
+        SELECT DISTINCT date_trunc('month', d)::date FROM unnest(days) AS d ORDER BY 1
+    LOOP
+        suffix := to_char(month_start, 'YYYYMM');
+        FOREACH parent IN ARRAY ARRAY['sales', 'sale_items'] LOOP
+            IF to_regclass(format('%s_%s', parent, suffix)) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                    parent || '_' || suffix, parent,
+                    month_start, (month_start + INTERVAL '1 month')::date
+                );
+                created := created + 1;
+            END IF;
+        END LOOP;
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Migration of a database created with unpartitioned sales / sale_items.
+-- No-op when the tables are already partitioned (fresh installs).
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'sales'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    DROP VIEW IF EXISTS v_star_schema;
+    DROP VIEW IF EXISTS v_sale_totals;
+
+    ALTER TABLE sale_items RENAME TO sale_items_unpartitioned;
+    ALTER TABLE sales RENAME TO sales_unpartitioned;
+    ALTER TABLE sale_items_unpartitioned RENAME CONSTRAINT sale_items_pkey TO sale_items_unpartitioned_pkey;
+    ALTER TABLE sales_unpartitioned RENAME CONSTRAINT sales_pkey TO sales_unpartitioned_pkey;
+
+    CREATE TABLE sales (
+        sale_id     INTEGER NOT NULL,
+        sale_date   DATE NOT NULL,
+        customer_id INTEGER NOT NULL REFERENCES customers(customer_id),
+        channel_id  INTEGER NOT NULL REFERENCES channels(channel_id),
+        PRIMARY KEY (sale_id, sale_date)
+    ) PARTITION BY RANGE (sale_date);
+
+    CREATE TABLE sale_items (
+        item_id          INTEGER NOT NULL,
+        sale_id          INTEGER NOT NULL,
+        sale_date        DATE NOT NULL,
+        product_id       INTEGER NOT NULL REFERENCES products(product_id),
+        quantity         INTEGER NOT NULL CHECK (quantity > 0),
+        original_price   NUMERIC(10, 2) NOT NULL,
+        discount_applied NUMERIC(10, 2) NOT NULL DEFAULT 0.00,
+        PRIMARY KEY (item_id, sale_date),
+        FOREIGN KEY (sale_id, sale_date) REFERENCES sales(sale_id, sale_date)
+    ) PARTITION BY RANGE (sale_date);
+
+    CREATE INDEX idx_sales_sale_date ON sales (sale_date);
+    CREATE INDEX idx_sales_customer_id ON sales (customer_id);
+    CREATE INDEX idx_sales_channel_id ON sales (channel_id);
+    CREATE INDEX idx_sale_items_sale_id ON sale_items (sale_id, sale_date);
+    CREATE INDEX idx_sale_items_product_id ON sale_items (product_id);
+
+    PERFORM create_sales_partitions(ARRAY(SELECT DISTINCT sale_date FROM sales_unpartitioned));
+
+    INSERT INTO sales (sale_id, sale_date, customer_id, channel_id)
+    SELECT sale_id, sale_date, customer_id, channel_id FROM sales_unpartitioned;
+
+    INSERT INTO sale_items (item_id, sale_id, sale_date, product_id, quantity, original_price, discount_applied)
+    SELECT si.item_id, si.sale_id, s.sale_date, si.product_id, si.quantity, si.original_price, si.discount_applied
+    FROM sale_items_unpartitioned si
+    JOIN sales_unpartitioned s ON s.sale_id = si.sale_id;
+
+    DROP TABLE sale_items_unpartitioned;
+    DROP TABLE sales_unpartitioned;
+END;
+$$;
+
+-- Ids are unique per date only: the fact tables of 04_star_schema_tables.sql
+-- take the same composite keys. No-op when they already have them.
+DO $$
+BEGIN
+    IF (SELECT indnatts FROM pg_index WHERE indexrelid = 'fact_sale_items_pkey'::regclass) = 1 THEN
+        ALTER TABLE fact_sale_items
+            DROP CONSTRAINT fact_sale_items_pkey,
+            ADD PRIMARY KEY (item_id, sale_date);
+    END IF;
+    IF (SELECT indnatts FROM pg_index WHERE indexrelid = 'fact_sale_totals_pkey'::regclass) = 1 THEN
+        ALTER TABLE fact_sale_totals
+            DROP CONSTRAINT fact_sale_totals_pkey,
+            ADD PRIMARY KEY (sale_id, sale_date);
+    END IF;
+END;
+$$;
+
+-- Same definitions as 02_create_star_schema_view.sql, recreated on the
+-- partitioned tables after a migration
+CREATE OR REPLACE VIEW v_star_schema AS
+SELECT
+    si.item_id,
+    s.sale_id,
+    s.sale_date,
+
+    c.customer_id,
+    c.first_name,
+    c.last_name,
+    c.email,
+    c.gender,
+    ar.age_range_label AS age_range,
+    c.signup_date,
+    co.country_name AS country,
+
+    p.product_id,
+    p.product_name,
+    cat.category_name AS category,
+    b.brand_name AS brand,
+    col.color_name AS color,
+    sz.size_label AS size,
+    p.catalog_price,
+    p.cost_price,
+
+    ch.channel_name AS channel,
+    ch.campaign_name AS channel_campaigns,
+
+    si.quantity,
+    si.original_price,
+    si.discount_applied,
+    CASE WHEN si.discount_applied > 0 THEN 1 ELSE 0 END AS discounted,
+    ROUND(si.discount_applied / NULLIF(si.original_price, 0), 4) AS discount_percent,
+    (si.original_price - si.discount_applied) AS unit_price,
+    (si.quantity * (si.original_price - si.discount_applied)) AS item_total
+FROM sale_items si
+JOIN sales s ON si.sale_id = s.sale_id AND si.sale_date = s.sale_date
+JOIN customers c ON s.customer_id = c.customer_id
+JOIN products p ON si.product_id = p.product_id
+JOIN channels ch ON s.channel_id = ch.channel_id
+JOIN countries co ON c.country_id = co.country_id
+JOIN age_ranges ar ON c.age_range_id = ar.age_range_id
+JOIN categories cat ON p.category_id = cat.category_id
+JOIN brands b ON p.brand_id = b.brand_id
+JOIN colors col ON p.color_id = col.color_id
+JOIN sizes sz ON p.size_id = sz.size_id;
+
+-- Dropped first: older databases have the view without sale_date
+DROP VIEW IF EXISTS v_sale_totals;
+CREATE VIEW v_sale_totals AS
+SELECT
+    sale_id,
+    sale_date,
+    SUM(quantity * (original_price - discount_applied)) AS total_amount
+FROM sale_items
+GROUP BY sale_id, sale_date;
@@ -0,0 +1,12 @@
+-- Rows set aside by the validation stage before the load, with the rules
+-- they broke and the row itself. One row per (date, table, key): a retried
+-- load rewrites its rejects.
+CREATE TABLE IF NOT EXISTS rejected_rows (
+    sale_date   DATE NOT NULL,
+    table_name  VARCHAR(64) NOT NULL,
+    row_key     VARCHAR(255) NOT NULL,
+    rules       TEXT NOT NULL,
+    payload     JSONB NOT NULL,
+    rejected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (sale_date, table_name, row_key)
+);
@@ -0,0 +1,12 @@
+-- Last change of the star schema rows of each date: set by the loader for
+-- the dates it loads and the dates touched by a customer or product update.
+-- Incremental Parquet exports (python -m src.export) compare it with the
+-- version of each partition they wrote.
+CREATE TABLE IF NOT EXISTS star_date_changes (
+    sale_date  DATE PRIMARY KEY,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+INSERT INTO star_date_changes (sale_date)
+SELECT DISTINCT sale_date FROM sales
+ON CONFLICT (sale_date) DO NOTHING;
@@ -0,0 +1,118 @@
+from datetime import date
+
+import pandas as pd
+
+from ..utils.logger import setup_logger
+from ..utils.metrics import track_stage
+
+logger = setup_logger(__name__)
+
+ROLLUP_TABLE = "daily_sales_rollup"
+DETAIL_TABLE = "fact_sale_items"
+
+ROLLUP_DIMENSIONS = ["sale_date", "channel", "category", "country"]
+DETAIL_DIMENSIONS = ROLLUP_DIMENSIONS + [
+    "channel_campaigns", "brand", "color", "size", "age_range", "gender",
+    "product_id", "customer_id",
+]
+
+# Additive measures: stored per day x channel x category x country, so any
+# coarser grouping is a SUM over the rollup rows.
+MEASURES = {
+    "items": "count(*)",
+    "units": "SUM(quantity)",
+    "gross_amount": "SUM(quantity * original_price)",
+    "discount_amount": "SUM(quantity * discount_applied)",
+    "revenue": "SUM(item_total)",
+    "catalog_amount": "SUM(quantity * catalog_price)",
+    "cost_amount": "SUM(quantity * cost_price)",
+}
+# Counts stay integers; the other measures are NUMERIC amounts
+COUNT_MEASURES = ["items", "units"]
+
+ROLLUP_DELETE_SQL = f"DELETE FROM {ROLLUP_TABLE} WHERE sale_date = ANY(%s)"
+# Same columns as DETAIL_TABLE; read when the fact tables are not maintained
+STAR_VIEW = "v_star_schema"
+
+
+def rollup_insert_sql(source):
+    return (
+        f"INSERT INTO {ROLLUP_TABLE} ({', '.join(ROLLUP_DIMENSIONS + list(MEASURES))}) "
+        f"SELECT {', '.join(ROLLUP_DIMENSIONS)}, "
+        f"{', '.join(MEASURES.values())} "
+        f"FROM {source} WHERE sale_date = ANY(%s) "
+        f"GROUP BY {', '.join(ROLLUP_DIMENSIONS)}"
+    )
+
+
+def refresh_rollups(cur, dates, source=DETAIL_TABLE):
+    with track_stage("refresh", table=ROLLUP_TABLE) as stage:
+        cur.execute(ROLLUP_DELETE_SQL, (dates,))
+        cur.execute(rollup_insert_sql(source), (dates,))
+        stage["rows_out"] = cur.rowcount
+    logger.info(f"{ROLLUP_TABLE}: {cur.rowcount} rows refreshed for {len(dates)} dates")
+
+
+def build_query(date_from, date_to, group_by, filters):
+    dimensions = list(group_by) + list(filters)
+    unknown = [dim for dim in dimensions if dim not in DETAIL_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimensions {unknown}, expected some of {DETAIL_DIMENSIONS}")
+
+    from_rollup = all(dim in ROLLUP_DIMENSIONS for dim in dimensions)
+    source = ROLLUP_TABLE if from_rollup else DETAIL_TABLE
+    measures = [
+        f"SUM({name}) AS {name}" if from_rollup else f"{expr} AS {name}"
+        for name, expr in MEASURES.items()
+    ]
+
+    conditions = ["sale_date BETWEEN %s AND %s"]
+    params = [date_from, date_to]
+    for dim, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            conditions.append(f"{dim} = ANY(%s)")
+            params.append(list(value))
+        else:
+            conditions.append(f"{dim} = %s")
+            params.append(value)
+
+    sql = f"SELECT {', '.join(list(group_by) + measures)} FROM {source} WHERE {' AND '.join(conditions)}"
+    if group_by:
+        sql += f" GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}"
+    return sql, params, source
+
+
+def add_ratios(df):
+    df["margin"] = df["revenue"] - df["cost_amount"]
+    df["margin_rate"] = df["margin"] / df["revenue"].where(df["revenue"] != 0)
+    df["catalog_margin"] = df["catalog_amount"] - df["cost_amount"]
+    df["discount_rate"] = df["discount_amount"] / df["gross_amount"].where(df["gross_amount"] != 0)
+    return df
+
+
+def query_sales(date_from, date_to=None, group_by=("sale_date",), filters=None, conn=None):
+    date_to = date_to or date_from
+    if isinstance(date_from, date) and date_from > date_to:
+        raise ValueError(f"date_from {date_from} is after date_to {date_to}")
+
+    sql, params, source = build_query(date_from, date_to, group_by, filters or {})
+    logger.info(f"Answering {list(group_by)} over {date_from} -> {date_to} from {source}")
+
+    own_conn = conn is None
+    if own_conn:
+        from ..ingestion.postgres_loader import get_connection, release_connection
+
+        conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            columns = [col[0] for col in cur.description]
+            df = pd.DataFrame(cur.fetchall(), columns=columns)
+    finally:
+        if own_conn:
+            release_connection(conn)
+
+    # SUM over no rollup row is NULL: an empty range counts 0 items
+    df = df.astype({name: float for name in MEASURES if name not in COUNT_MEASURES})
+    df[COUNT_MEASURES] = df[COUNT_MEASURES].fillna(0).astype("int64")
+    return add_ratios(df)
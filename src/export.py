@@ -0,0 +1,320 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+
+import psycopg2.extensions
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .main import parse_date
+from .ingestion.minio_client import get_s3_client
+from .ingestion.postgres_loader import get_connection, release_connection
+from .utils.logger import setup_logger
+from .utils.metrics import publish_metrics, track_stage
+
+logger = setup_logger("export")
+
+EXPORT_SOURCE = "v_star_schema"
+BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+STATE_NAME = "_export_state.json"
+PART_NAME = "part-0.parquet"
+# Carried by the sale_date=YYYY-MM-DD directory, as in Hive-style layouts
+PARTITION_COLUMN = "sale_date"
+PARTITION_PREFIX = f"{PARTITION_COLUMN}="
+
+EXPORT_SQL = f"SELECT * FROM {EXPORT_SOURCE} WHERE sale_date = %s"
+
+CHANGES_SQL = (
+    "SELECT sale_date, changed_at FROM star_date_changes "
+    "WHERE sale_date >= coalesce(%s, '-infinity'::date) AND sale_date <= coalesce(%s, 'infinity'::date) "
+    "ORDER BY sale_date"
+)
+
+# Arrow types by PostgreSQL type OID; text, varchar and enums are strings
+ARROW_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    700: pa.float32(),
+    701: pa.float64(),
+    1700: pa.float64(),
+    1082: pa.date32(),
+    1114: pa.timestamp("us"),
+    1184: pa.timestamp("us", tz="UTC"),
+}
+
+# NUMERIC columns come back as float instead of one Decimal object per value
+NUMERIC_AS_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values,
+    "NUMERIC_AS_FLOAT",
+    lambda value, cur: float(value) if value is not None else None,
+)
+
+
+class LocalExportTarget:
+    def __init__(self, root):
+        self.root = root
+
+    def __str__(self):
+        return self.root
+
+    def partition_path(self, day):
+        return os.path.join(self.root, f"{PARTITION_PREFIX}{day.isoformat()}", PART_NAME)
+
+    def publish(self, day, path):
+        final_path = self.partition_path(day)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        shutil.move(path, final_path)
+
+    def remove(self, day):
+        shutil.rmtree(os.path.dirname(self.partition_path(day)), ignore_errors=True)
+
+    def list_partitions(self):
+        if not os.path.isdir(self.root):
+            return set()
+        return {
+            date.fromisoformat(name[len(PARTITION_PREFIX):])
+            for name in os.listdir(self.root) if name.startswith(PARTITION_PREFIX)
+        }
+
+    def read_state(self):
+        path = os.path.join(self.root, STATE_NAME)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def write_state(self, state):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, STATE_NAME)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+
+class S3ExportTarget:
+    def __init__(self, s3, bucket, prefix):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def partition_key(self, day):
+        return f"{self.prefix}/{PARTITION_PREFIX}{day.isoformat()}/{PART_NAME}"
+
+    def publish(self, day, path):
+        self.s3.upload_file(path, self.bucket, self.partition_key(day))
+
+    def remove(self, day):
+        self.s3.delete_object(Bucket=self.bucket, Key=self.partition_key(day))
+
+    def list_partitions(self):
+        days = set()
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/{PARTITION_PREFIX}"):
+            for obj in page.get("Contents", []):
+                folder = obj["Key"][len(self.prefix) + 1:].split("/")[0]
+                days.add(date.fromisoformat(folder[len(PARTITION_PREFIX):]))
+        return days
+
+    def read_state(self):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=f"{self.prefix}/{STATE_NAME}")
+        except self.s3.exceptions.NoSuchKey:
+            return {}
+        return json.loads(response["Body"].read())
+
+    def write_state(self, state):
+        self.s3.put_object(
+            Bucket=self.bucket, Key=f"{self.prefix}/{STATE_NAME}", Body=json.dumps(state).encode()
+        )
+
+
+def get_target(output):
+    if output.startswith("s3://"):
+        bucket, _, prefix = output[len("s3://"):].partition("/")
+        return S3ExportTarget(get_s3_client(), bucket, prefix)
+    return LocalExportTarget(output)
+
+
+@contextmanager
+def staging_file():
+    # Partitions are written locally, then moved or uploaded once complete
+    directory = tempfile.mkdtemp(prefix="star_export_")
+    try:
+        yield os.path.join(directory, PART_NAME)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def arrow_schema(description):
+    return pa.schema([
+        (col.name, ARROW_TYPES.get(col.type_code, pa.string()))
+        for col in description if col.name != PARTITION_COLUMN
+    ])
+
+
+def batch_table(rows, description, schema):
+    columns = dict(zip((col.name for col in description), zip(*rows)))
+    return pa.Table.from_arrays(
+        [pa.array(columns[field.name], type=field.type) for field in schema],
+        schema=schema,
+    )
+
+
+def export_day(conn, target, day, batch_rows):
+    rows_out = 0
+    with staging_file() as path, track_stage("export", table=EXPORT_SOURCE) as stage:
+        # Named cursor: rows stay on the server and arrive batch_rows at a time
+        with conn.cursor(name=f"star_export_{day:%Y%m%d}") as cur:
+            cur.itersize = batch_rows
+            psycopg2.extensions.register_type(NUMERIC_AS_FLOAT, cur)
+            cur.execute(EXPORT_SQL, (day,))
+
+            writer = None
+            try:
+                while rows := cur.fetchmany(batch_rows):
+                    if writer is None:
+                        schema = arrow_schema(cur.description)
+                        writer = pq.ParquetWriter(path, schema)
+                    writer.write_table(batch_table(rows, cur.description, schema))
+                    rows_out += len(rows)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+        if rows_out:
+            target.publish(day, path)
+        else:
+            target.remove(day)
+        stage["rows_out"] = rows_out
+    return rows_out
+
+
+def in_range(day, date_from, date_to):
+    return (date_from is None or day >= date_from) and (date_to is None or day <= date_to)
+
+
+def remove_stale(target, exported, versions, date_from, date_to):
+    # Dates of the range no longer in star_date_changes: their partitions
+    # would otherwise keep serving data the database no longer has
+    known = target.list_partitions() | {date.fromisoformat(day) for day in exported}
+    stale = sorted(day for day in known - set(versions) if in_range(day, date_from, date_to))
+    for day in stale:
+        target.remove(day)
+        exported.pop(day.isoformat(), None)
+    if stale:
+        logger.info(f"{len(stale)} partitions obsolètes supprimées de {target}")
+    return stale
+
+
+def export_star(target, date_from=None, date_to=None, incremental=False, batch_rows=BATCH_ROWS):
+    # {date: changed_at} of the partitions already exported
+    state = target.read_state()
+    exported = state.get("partitions", {}) if state.get("source") == EXPORT_SOURCE else {}
+
+    conn = get_connection()
+    try:
+        # One snapshot for the whole export: partitions and their recorded
+        # versions are consistent even if a load commits meanwhile.
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with conn.cursor() as cur:
+            cur.execute(CHANGES_SQL, (date_from, date_to))
+            versions = {day: changed_at.isoformat() for day, changed_at in cur.fetchall()}
+
+        days = [
+            day for day, version in versions.items()
+            if not incremental or exported.get(day.isoformat()) != version
+        ]
+        logger.info(f"{len(days)} dates sur {len(versions)} à exporter vers {target}")
+
+        total = 0
+        try:
+            if not incremental:
+                remove_stale(target, exported, versions, date_from, date_to)
+            for day in days:
+                rows = export_day(conn, target, day, batch_rows)
+                exported[day.isoformat()] = versions[day]
+                total += rows
+                logger.info(f"{day}: {rows} lignes exportées")
+        finally:
+            target.write_state({"source": EXPORT_SOURCE, "partitions": exported})
+    finally:
+        # A pooled connection (PG_KEEP_CONNECTIONS) goes back writable for
+        # the loads that borrow it next
+        conn.rollback()
+        conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+        release_connection(conn)
+
+    logger.info(f"Export terminé: {total} lignes sur {len(days)} dates")
+    return total
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Export Parquet du schéma étoile")
+    parser.add_argument(
+        "--output",
+        default=os.getenv("EXPORT_OUTPUT", "exports/star_schema"),
+        help="Dossier local ou s3://bucket/prefix (defaut: EXPORT_OUTPUT ou exports/star_schema)",
+    )
+    parser.add_argument(
+        "--from",
+        dest="date_from",
+        type=parse_date,
+        help="Première date exportée, incluse (YYYYMMDD)",
+    )
+    parser.add_argument(
+        "--to",
+        dest="date_to",
+        type=parse_date,
+        help="Dernière date exportée, incluse (YYYYMMDD)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="N'exporte que les dates modifiées depuis le dernier export",
+    )
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=BATCH_ROWS,
+        help="Lignes lues par aller-retour au curseur serveur (defaut: EXPORT_BATCH_ROWS ou 50000)",
+    )
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.batch_rows < 1:
+        parser.error("--batch-rows doit être >= 1")
+    if args.date_from and args.date_to and args.date_from > args.date_to:
+        parser.error("--from doit précéder --to")
+
+    try:
+        export_star(
+            get_target(args.output),
+            args.date_from.date() if args.date_from else None,
+            args.date_to.date() if args.date_to else None,
+            args.incremental,
+            args.batch_rows,
+        )
+        code = 0
+    except Exception as e:
+        logger.error(f"Echec de l'export: {e}", exc_info=True)
+        code = 1
+
+    publish_metrics({"runner": "cli", "task": "export"}, success=code == 0)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
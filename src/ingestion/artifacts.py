@@ -0,0 +1,39 @@
+import io
+
+import pandas as pd
+
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def write_frame(s3, bucket, key, df):
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False)
+    s3.put_object(Bucket=bucket, Key=key, Body=buf.getvalue())
+    logger.info(f"{len(df)} rows written to s3://{bucket}/{key}")
+    return {"bucket": bucket, "key": key, "rows": len(df)}
+
+
+def read_frame(s3, ref):
+    response = s3.get_object(Bucket=ref["bucket"], Key=ref["key"])
+    return pd.read_parquet(io.BytesIO(response["Body"].read()))
+
+
+def write_tables(s3, bucket, prefix, tables):
+    return {
+        name: write_frame(s3, bucket, f"{prefix}/{name}.parquet", df)
+        for name, df in tables.items()
+    }
+
+
+def read_tables(s3, refs):
+    return {name: read_frame(s3, ref) for name, ref in refs.items()}
+
+
+def delete_prefix(s3, bucket, prefix):
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}/"):
+        keys = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+        if keys:
+            s3.delete_objects(Bucket=bucket, Delete={"Objects": keys})
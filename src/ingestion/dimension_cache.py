@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+from functools import lru_cache
+
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DIMENSIONS = {
+    "countries": ("country_id", "country_name", ()),
+    "categories": ("category_id", "category_name", ()),
+    "brands": ("brand_id", "brand_name", ()),
+    "colors": ("color_id", "color_name", ()),
+    "sizes": ("size_id", "size_label", ()),
+    "age_ranges": ("age_range_id", "age_range_label", ()),
+    "channels": ("channel_id", "channel_name", ("campaign_name",)),
+}
+
+
+def read_snapshot(path):
+    # A missing or unreadable snapshot is a cache miss, rebuilt from the table
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or not {"max_id", "names"} <= snapshot.keys():
+        return None
+    return snapshot
+
+
+class DimensionCache:
+    def __init__(self, snapshot_dir=None):
+        self.snapshot_dir = snapshot_dir
+        self.maps = {}
+        self.pending = {}
+        self.dirty = set()
+
+    def resolve(self, cur, table, df):
+        id_col, name_col, extra_cols = DIMENSIONS[table]
+        known = self.table_map(cur, table)
+        pending = self.pending.setdefault(table, {})
+
+        names = df[name_col]
+        unseen = df[~names.isin(known) & ~names.isin(pending)].drop_duplicates(subset=[name_col])
+        if not unseen.empty:
+            pending.update(self.insert_unseen(cur, table, unseen[[name_col, *extra_cols]]))
+            self.dirty.add(table)
+
+        return {name: pending[name] if name in pending else known[name] for name in names}
+
+    def insert_unseen(self, cur, table, unseen):
+        id_col, name_col, _ = DIMENSIONS[table]
+        cols = list(unseen.columns)
+        arrays = [
+            unseen[col].astype(object).where(unseen[col].notna(), None).tolist()
+            for col in cols
+        ]
+        unnest_args = ", ".join("%s::text[]" for _ in cols)
+
+        cur.execute(
+            f"INSERT INTO {table} ({', '.join(cols)}) SELECT * FROM unnest({unnest_args}) "
+            f"ON CONFLICT ({name_col}) DO NOTHING RETURNING {id_col}, {name_col}",
+            arrays,
+        )
+        found = {row[1]: row[0] for row in cur.fetchall()}
+
+        # Names another writer created since our map was filled
+        existing = [name for name in arrays[0] if name not in found]
+        if existing:
+            cur.execute(
+                f"SELECT {id_col}, {name_col} FROM {table} WHERE {name_col} = ANY(%s)",
+                (existing,),
+            )
+            found.update({row[1]: row[0] for row in cur.fetchall()})
+
+        logger.info(f"{table}: {len(unseen)} unseen names resolved")
+        return found
+
+    def table_map(self, cur, table):
+        if table not in self.maps:
+            self.maps[table] = self.load_snapshot(cur, table)
+        return self.maps[table]
+
+    def snapshot_path(self, table):
+        return os.path.join(self.snapshot_dir, f"{table}.json")
+
+    def load_snapshot(self, cur, table):
+        if not self.snapshot_dir:
+            return {}
+
+        id_col, name_col, _ = DIMENSIONS[table]
+        cur.execute(f"SELECT COALESCE(MAX({id_col}), 0) FROM {table}")
+        max_id = cur.fetchone()[0]
+
+        snapshot = read_snapshot(self.snapshot_path(table))
+        if snapshot is not None:
+            if snapshot["max_id"] == max_id:
+                return snapshot["names"]
+            logger.info(f"{table}: snapshot max id {snapshot['max_id']} != {max_id}, reloading")
+
+        # A snapshot must describe the whole table to be validated by max id
+        cur.execute(f"SELECT {id_col}, {name_col} FROM {table}")
+        self.dirty.add(table)
+        return {row[1]: row[0] for row in cur.fetchall()}
+
+    def save_snapshot(self, table):
+        names = self.maps[table]
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        # Own temp file: backfill processes, DAG tasks and the worker may
+        # share DIMENSION_CACHE_DIR and write the same table at once
+        fd, tmp_path = tempfile.mkstemp(dir=self.snapshot_dir, prefix=f".{table}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"max_id": max(names.values(), default=0), "names": names}, f)
+            os.replace(tmp_path, self.snapshot_path(table))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def commit(self):
+        for table, pending in self.pending.items():
+            self.maps[table].update(pending)
+        if self.snapshot_dir:
+            for table in self.dirty:
+                self.save_snapshot(table)
+        self.pending = {}
+        self.dirty = set()
+
+    def rollback(self):
+        self.pending = {}
+        self.dirty = set()
+
+
+@lru_cache(maxsize=None)
+def get_dimension_cache():
+    return DimensionCache(os.getenv("DIMENSION_CACHE_DIR") or None)
@@ -0,0 +1,109 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ..utils.logger import setup_logger
+from ..utils.metrics import increment
+
+logger = setup_logger(__name__)
+
+PART_SIZE = int(os.getenv("MINIO_DOWNLOAD_PART_SIZE", str(16 * 1024 * 1024)))
+DOWNLOAD_WORKERS = int(os.getenv("MINIO_DOWNLOAD_WORKERS", "8"))
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def cache_path(root, bucket, key):
+    return os.path.join(root, bucket, key)
+
+
+def read_meta(path):
+    try:
+        with open(f"{path}.meta.json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_meta(path, etag, size):
+    with open(f"{path}.meta.json.tmp", "w") as f:
+        json.dump({"etag": etag, "size": size}, f)
+    os.replace(f"{path}.meta.json.tmp", f"{path}.meta.json")
+
+
+def is_fresh(path, etag, size):
+    meta = read_meta(path)
+    return (
+        meta is not None
+        and meta["etag"] == etag
+        and os.path.exists(path)
+        and os.path.getsize(path) == size
+    )
+
+
+def part_ranges(size, part_size=PART_SIZE):
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+def download_part(s3, bucket, key, etag, fd, start, end):
+    # IfMatch fails the part if the object is replaced mid-download
+    response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag)
+    offset = start
+    body = response["Body"]
+    while True:
+        block = body.read(READ_BLOCK_SIZE)
+        if not block:
+            break
+        os.pwrite(fd, block, offset)
+        offset += len(block)
+    if offset != end + 1:
+        raise IOError(f"Short read on s3://{bucket}/{key} bytes {start}-{end}: got {offset - start}")
+    return offset - start
+
+
+def download(s3, bucket, key, etag, size, path):
+    ranges = part_ranges(size)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.part"
+    start = time.perf_counter()
+
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size)
+        with ThreadPoolExecutor(max_workers=max(1, min(DOWNLOAD_WORKERS, len(ranges)))) as executor:
+            futures = [
+                executor.submit(download_part, s3, bucket, key, etag, fd, first, last)
+                for first, last in ranges
+            ]
+            # Counted here: stage metrics belong to the calling thread
+            increment("bytes_read", sum(future.result() for future in futures))
+        os.fsync(fd)
+    except Exception:
+        os.close(fd)
+        os.remove(tmp_path)
+        raise
+    os.close(fd)
+
+    os.replace(tmp_path, path)
+    write_meta(path, etag, size)
+    seconds = time.perf_counter() - start
+    increment("download_seconds", seconds)
+    logger.info(
+        f"Downloaded s3://{bucket}/{key} ({size} bytes, {len(ranges)} parts) "
+        f"to {path} in {seconds:.2f}s"
+    )
+
+
+def fetch_object(s3, bucket, key, root):
+    # Returns the local path and the HEAD response of the object
+    head = s3.head_object(Bucket=bucket, Key=key)
+    etag, size = head["ETag"], head["ContentLength"]
+    path = cache_path(root, bucket, key)
+
+    if is_fresh(path, etag, size):
+        logger.info(f"Download cache hit for s3://{bucket}/{key} (ETag {etag})")
+        return path, head
+
+    logger.info(f"Download cache miss for s3://{bucket}/{key}, fetching ETag {etag}")
+    download(s3, bucket, key, etag, size, path)
+    return path, head
@@ -0,0 +1,105 @@
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MANIFEST_UPSERT_SQL = (
+    "INSERT INTO ingestion_manifest (sale_date, bucket, source_key, etag, sales, sale_items) "
+    "SELECT * FROM unnest(%s::date[], %s::text[], %s::text[], %s::text[], %s::int[], %s::int[]) "
+    "ON CONFLICT (bucket, source_key, sale_date) DO UPDATE SET "
+    "etag = EXCLUDED.etag, sales = EXCLUDED.sales, sale_items = EXCLUDED.sale_items, "
+    "loaded_at = now()"
+)
+
+
+def object_source(bucket, key, etag):
+    return {"bucket": bucket, "key": key, "etag": etag.strip('"')}
+
+
+def head_source(s3, bucket, key):
+    return object_source(bucket, key, s3.head_object(Bucket=bucket, Key=key)["ETag"])
+
+
+def open_connection(conn):
+    if conn is not None:
+        return conn, False
+    # Imported here: the loader imports this module to record its loads
+    from .postgres_loader import get_connection
+
+    return get_connection(), True
+
+
+def close_connection(conn):
+    from .postgres_loader import release_connection
+
+    release_connection(conn)
+
+
+def loaded_dates(sources, conn=None):
+    # Dates already loaded from each object, for its current ETag only
+    loaded = {source["key"]: set() for source in sources}
+    if not sources:
+        return loaded
+    etags = {source["key"]: source["etag"] for source in sources}
+
+    conn, own_conn = open_connection(conn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT source_key, etag, sale_date FROM ingestion_manifest "
+                "WHERE bucket = %s AND source_key = ANY(%s)",
+                (sources[0]["bucket"], list(etags)),
+            )
+            for key, etag, day in cur.fetchall():
+                if etags[key] == etag:
+                    loaded[key].add(day)
+    finally:
+        if own_conn:
+            close_connection(conn)
+    return loaded
+
+
+def pending_dates(source, dates, conn=None):
+    done = loaded_dates([source], conn)[source["key"]]
+    pending = [day for day in dates if day not in done]
+    if len(pending) < len(dates):
+        logger.info(
+            f"{len(dates) - len(pending)} dates already loaded from "
+            f"s3://{source['bucket']}/{source['key']} (ETag {source['etag']})"
+        )
+    return pending
+
+
+def record_load(cur, source, counts):
+    # counts: {sale_date: (sales, sale_items)}
+    days = sorted(counts)
+    cur.execute(
+        MANIFEST_UPSERT_SQL,
+        (
+            days,
+            [source["bucket"]] * len(days),
+            [source["key"]] * len(days),
+            [source["etag"]] * len(days),
+            [counts[day][0] for day in days],
+            [counts[day][1] for day in days],
+        ),
+    )
+
+
+def table_counts(tables):
+    sales = tables["sales"]["sale_date"].value_counts()
+    items = tables["sale_items"]["sale_date"].value_counts()
+    return {day: (int(sales.get(day, 0)), int(items.get(day, 0))) for day in sales.index}
+
+
+def record_empty(source, dates, conn=None):
+    # Dates without rows are recorded too, so they are not re-read each run
+    if not dates:
+        return
+    conn, own_conn = open_connection(conn)
+    try:
+        with conn.cursor() as cur:
+            record_load(cur, source, {day: (0, 0) for day in dates})
+        conn.commit()
+    finally:
+        if own_conn:
+            close_connection(conn)
@@ -1,29 +1,146 @@
+import gzip
+import mmap
 import os
-import io
+import time
+from datetime import date
+
 import boto3
 import pandas as pd
 
+from .transformer import SOURCE_COLUMNS, SOURCE_DTYPES, concat_frames
 from ..utils.logger import setup_logger
+from ..utils.metrics import CountingReader, increment, track_stage
 
 logger = setup_logger(__name__)
 
+CSV_CHUNK_SIZE = int(os.getenv("MINIO_CSV_CHUNK_SIZE", "100000"))
+
+# Compressed sources: the codec comes from the key suffix, else from the
+# object's Content-Encoding or Content-Type.
+CODEC_SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+CODEC_CONTENT_TYPES = {
+    "gzip": "gzip",
+    "x-gzip": "gzip",
+    "application/gzip": "gzip",
+    "application/x-gzip": "gzip",
+    "zstd": "zstd",
+    "application/zstd": "zstd",
+    "application/x-zstd": "zstd",
+}
 
-def read_csv_from_minio():
-    endpoint_url = os.getenv("MINIO_ENDPOINT", "http://minio:9000")
-    access_key = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
-    secret_key = os.getenv("MINIO_SECRET_KEY", "minioadmin123")
-    bucket = os.getenv("MINIO_BUCKET", "folder-source")
-    csv_key = os.getenv("MINIO_CSV_KEY", "fashion_store_sales.csv")
 
-    s3 = boto3.client(
+def get_s3_client(endpoint_url=None, access_key=None, secret_key=None):
+    return boto3.client(
         "s3",
-        endpoint_url=endpoint_url,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
+        endpoint_url=endpoint_url or os.getenv("MINIO_ENDPOINT", "http://minio:9000"),
+        aws_access_key_id=access_key or os.getenv("MINIO_ACCESS_KEY", "minioadmin"),
+        aws_secret_access_key=secret_key or os.getenv("MINIO_SECRET_KEY", "minioadmin123"),
+    )
+
+
+def as_date_set(target_dates):
+    if target_dates is None:
+        return None
+    if isinstance(target_dates, date):
+        return {target_dates}
+    return set(target_dates)
+
+
+def detect_codec(key, content_type=None, content_encoding=None):
+    for suffix, codec in CODEC_SUFFIXES.items():
+        if key.endswith(suffix):
+            return codec
+    for value in (content_encoding, content_type):
+        codec = CODEC_CONTENT_TYPES.get((value or "").split(";")[0].strip().lower())
+        if codec:
+            return codec
+    return None
+
+
+def decompress(body, codec):
+    # Decompressed as the parser reads: the plain CSV never sits in memory
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=body, mode="rb")
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().stream_reader(body, read_across_frames=True)
+    return body
+
+
+def read_csv_stream(body, target_dates=None, chunksize=CSV_CHUNK_SIZE):
+    wanted = as_date_set(target_dates)
+    if wanted is not None:
+        wanted = pd.to_datetime(sorted(wanted))
+    reader = pd.read_csv(
+        body,
+        usecols=SOURCE_COLUMNS,
+        dtype=SOURCE_DTYPES,
+        chunksize=chunksize,
     )
 
-    logger.info(f"Reading s3://{bucket}/{csv_key}")
-    response = s3.get_object(Bucket=bucket, Key=csv_key)
-    csv_bytes = response["Body"].read()
+    parts = []
+    scanned = 0
+    for chunk in reader:
+        scanned += len(chunk)
+        increment("rows_in", len(chunk))
+        if wanted is not None:
+            start = time.perf_counter()
+            chunk = chunk[pd.to_datetime(chunk["sale_date"]).isin(wanted)]
+            increment("filter_seconds", time.perf_counter() - start)
+        if not chunk.empty:
+            parts.append(chunk)
+
+    logger.info(f"{scanned} rows scanned, {sum(len(p) for p in parts)} kept")
+    if not parts:
+        return pd.DataFrame(columns=SOURCE_COLUMNS)
+    return concat_frames(parts)
+
+
+def read_csv_object(s3, bucket, key, target_dates=None):
+    download_dir = os.getenv("SOURCE_DOWNLOAD_DIR")
+    if download_dir:
+        from .download_cache import fetch_object
+
+        path, head = fetch_object(s3, bucket, key, download_dir)
+        if os.path.getsize(path) == 0:
+            # mmap refuses empty files, and pandas has no header to parse:
+            # same empty frame as a read that kept no rows
+            logger.info(f"s3://{bucket}/{key} is empty")
+            return pd.DataFrame(columns=SOURCE_COLUMNS)
+        codec = detect_codec(key, head.get("ContentType"), head.get("ContentEncoding"))
+        # Parsed straight from the page cache, without a copy in memory
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return read_csv_stream(decompress(buf, codec), target_dates)
+
+    response = s3.get_object(Bucket=bucket, Key=key)
+    codec = detect_codec(key, response.get("ContentType"), response.get("ContentEncoding"))
+    logger.info(f"Reading s3://{bucket}/{key}" + (f" ({codec})" if codec else ""))
+    # Counted before decompression: bytes_read is what crossed the network
+    return read_csv_stream(decompress(CountingReader(response["Body"]), codec), target_dates)
+
+
+def read_source(s3, bucket, csv_key, target_dates=None):
+    with track_stage("extract") as stage:
+        if os.getenv("SOURCE_CACHE"):
+            from .parquet_cache import get_cache_store, read_cached_source
+
+            store = get_cache_store(s3, bucket, csv_key)
+            etag = s3.head_object(Bucket=bucket, Key=csv_key)["ETag"]
+            df = read_cached_source(
+                store,
+                etag,
+                lambda: read_csv_object(s3, bucket, csv_key),
+                as_date_set(target_dates),
+            )
+        else:
+            df = read_csv_object(s3, bucket, csv_key, target_dates)
+        stage["rows_out"] = len(df)
+    return df
+
+
+def read_csv_from_minio(target_dates=None):
+    bucket = os.getenv("MINIO_BUCKET", "folder-source")
+    csv_key = os.getenv("MINIO_CSV_KEY", "fashion_store_sales.csv")
 
-    return pd.read_csv(io.BytesIO(csv_bytes))
+    return read_source(get_s3_client(), bucket, csv_key, target_dates)
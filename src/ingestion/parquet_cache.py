@@ -0,0 +1,160 @@
+import io
+import json
+import os
+import shutil
+from datetime import date
+
+import pandas as pd
+
+from .artifacts import delete_prefix
+from .transformer import SOURCE_COLUMNS, concat_frames, partition_by_date
+from ..utils.logger import setup_logger
+from ..utils.metrics import increment
+
+logger = setup_logger(__name__)
+
+MANIFEST_NAME = "_manifest.json"
+
+
+class LocalCacheStore:
+    def __init__(self, root):
+        self.root = root
+
+    def __str__(self):
+        return self.root
+
+    def write(self, path, data):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(data)
+
+    def read(self, path):
+        full_path = os.path.join(self.root, path)
+        if not os.path.exists(full_path):
+            return None
+        with open(full_path, "rb") as f:
+            return f.read()
+
+    def read_frame(self, path):
+        full_path = os.path.join(self.root, path)
+        increment("bytes_read", os.path.getsize(full_path))
+        return pd.read_parquet(full_path)
+
+    def list_versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return [
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        ]
+
+    def delete_version(self, version):
+        shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+
+
+class S3CacheStore:
+    def __init__(self, s3, bucket, prefix):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def write(self, path, data):
+        self.s3.put_object(Bucket=self.bucket, Key=f"{self.prefix}/{path}", Body=data)
+
+    def read(self, path):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=f"{self.prefix}/{path}")
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        data = response["Body"].read()
+        increment("bytes_read", len(data))
+        return data
+
+    def read_frame(self, path):
+        return pd.read_parquet(io.BytesIO(self.read(path)))
+
+    def list_versions(self):
+        paginator = self.s3.get_paginator("list_objects_v2")
+        versions = []
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/", Delimiter="/"):
+            for common in page.get("CommonPrefixes", []):
+                versions.append(common["Prefix"][len(self.prefix) + 1:].rstrip("/"))
+        return versions
+
+    def delete_version(self, version):
+        delete_prefix(self.s3, self.bucket, f"{self.prefix}/{version}")
+
+
+def get_cache_store(s3, bucket, csv_key):
+    backend = os.getenv("SOURCE_CACHE", "").lower()
+    if backend == "local":
+        root = os.getenv("SOURCE_CACHE_DIR", os.path.join(".cache", "source"))
+        return LocalCacheStore(os.path.join(root, bucket, csv_key))
+    if backend == "minio":
+        cache_bucket = os.getenv("SOURCE_CACHE_BUCKET", bucket)
+        prefix = os.getenv("SOURCE_CACHE_PREFIX", "_cache")
+        return S3CacheStore(s3, cache_bucket, f"{prefix.rstrip('/')}/{csv_key}")
+    if backend:
+        raise ValueError(f"Unknown SOURCE_CACHE backend '{backend}', expected 'local' or 'minio'")
+    return None
+
+
+def partition_path(version, day):
+    return f"{version}/sale_date={day.isoformat()}/part-0.parquet"
+
+
+def to_typed_frame(df):
+    df = df.copy()
+    df["sale_date"] = pd.to_datetime(df["sale_date"]).dt.date
+    df["signup_date"] = pd.to_datetime(df["signup_date"]).dt.date
+    return df
+
+
+def build_cache(store, version, df):
+    partitions = partition_by_date(to_typed_frame(df))
+    for day, part in partitions.items():
+        buf = io.BytesIO()
+        part.to_parquet(buf, index=False)
+        store.write(partition_path(version, day), buf.getvalue())
+
+    # Written last: a version without manifest is an interrupted build.
+    manifest = {
+        "etag": version,
+        "rows": len(df),
+        "dates": [day.isoformat() for day in partitions],
+    }
+    store.write(f"{version}/{MANIFEST_NAME}", json.dumps(manifest).encode())
+    logger.info(f"Cache built in {store}/{version}: {len(partitions)} partitions, {len(df)} rows")
+    return manifest
+
+
+def evict_stale_versions(store, version):
+    for stale in store.list_versions():
+        if stale != version:
+            store.delete_version(stale)
+            logger.info(f"Evicted stale cache version {store}/{stale}")
+
+
+def read_cached_source(store, etag, load_csv, target_dates=None):
+    version = etag.strip('"')
+    raw_manifest = store.read(f"{version}/{MANIFEST_NAME}")
+
+    if raw_manifest is None:
+        logger.info(f"Cache miss for ETag {version}, converting source to Parquet")
+        manifest = build_cache(store, version, load_csv())
+        evict_stale_versions(store, version)
+    else:
+        manifest = json.loads(raw_manifest)
+        logger.info(f"Cache hit for ETag {version}")
+
+    available = {date.fromisoformat(day) for day in manifest["dates"]}
+    wanted = available if target_dates is None else available & set(target_dates)
+
+    parts = [store.read_frame(partition_path(version, day)) for day in sorted(wanted)]
+    if not parts:
+        return pd.DataFrame(columns=SOURCE_COLUMNS)
+    return concat_frames(parts)
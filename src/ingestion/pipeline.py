@@ -0,0 +1,162 @@
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from .manifest import loaded_dates, object_source, record_empty
+from .minio_client import CODEC_SUFFIXES, as_date_set, read_source
+from .postgres_loader import load_to_postgres
+from .transformer import partition_by_date, transform_and_split
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", "4"))
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+SOURCE_SUFFIXES = (".csv", *(f".csv{suffix}" for suffix in CODEC_SUFFIXES))
+
+# YYYY-MM-DD or YYYYMMDD anywhere in the key, e.g. sales/2025-06-16/store_12.csv
+KEY_DATE = re.compile(r"(?<!\d)(\d{4})-?(\d{2})-?(\d{2})(?!\d)")
+
+DONE = object()
+# Batch of the dates an object has no rows for, recorded in the manifest
+EMPTY = object()
+
+
+def key_date(key):
+    match = KEY_DATE.search(key)
+    if not match:
+        return None
+    try:
+        return date(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+
+def list_source_keys(s3, bucket, prefix, target_dates=None):
+    # {key: etag} of the source objects under the prefix
+    wanted = as_date_set(target_dates)
+    keys = {}
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            # Folders starting with "_" (_cache/, _artifacts/) hold our own outputs
+            if any(part.startswith("_") for part in key.split("/")[:-1]):
+                continue
+            if not key.endswith(SOURCE_SUFFIXES):
+                continue
+            day = key_date(key)
+            if wanted is not None and day is not None and day not in wanted:
+                continue
+            keys[key] = obj["ETag"]
+
+    logger.info(f"{len(keys)} source objects under s3://{bucket}/{prefix}")
+    return keys
+
+
+def plan_objects(sources, target_dates=None, force=False, conn=None):
+    # {key: dates already loaded} for the objects still to read; an object
+    # is skipped once its dated key, or every wanted date, is in the manifest
+    done = {source["key"]: set() for source in sources} if force else loaded_dates(sources, conn)
+    wanted = as_date_set(target_dates)
+
+    plan = {}
+    for key, loaded in done.items():
+        day = key_date(key)
+        if day is not None and day in loaded:
+            continue
+        if day is None and wanted is not None and wanted <= loaded:
+            continue
+        plan[key] = loaded
+
+    if len(plan) < len(done):
+        logger.info(f"{len(done) - len(plan)} source objects already loaded, skipped")
+    return plan
+
+
+def ingest_prefix(s3, bucket, prefix, target_dates=None, load_mode=None,
+                  workers=FETCH_WORKERS, queue_size=QUEUE_SIZE, force=False):
+    etags = list_source_keys(s3, bucket, prefix, target_dates)
+    sources = {key: object_source(bucket, key, etag) for key, etag in etags.items()}
+    plan = plan_objects(list(sources.values()), target_dates, force)
+    keys = list(plan)
+    wanted = as_date_set(target_dates)
+
+    # Bounded queues between the stages: fetchers block once queue_size
+    # frames wait for the transform, which blocks once queue_size days wait
+    # for the load, so at most a few objects are held in memory.
+    frames = queue.Queue(maxsize=queue_size)
+    batches = queue.Queue(maxsize=queue_size)
+
+    def fetch(key):
+        try:
+            frames.put((key, read_source(s3, bucket, key, target_dates), None))
+        except Exception as e:
+            frames.put((key, None, e))
+
+    def fetch_all():
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(fetch, keys):
+                pass
+        frames.put(DONE)
+
+    def transform_all():
+        while (item := frames.get()) is not DONE:
+            key, df, error = item
+            if error is None:
+                try:
+                    partitions = partition_by_date(df)
+                    found = set()
+                    for day, part in partitions.items():
+                        if day in plan[key]:
+                            continue
+                        tables = transform_and_split(part, day, single_day=True)
+                        if tables is not None:
+                            found.add(day)
+                            batches.put((key, day, tables, None))
+                    # Without them, an undated object would be read again on
+                    # every run for dates it does not hold
+                    days = wanted if wanted is not None else set(partitions)
+                    empty = days - found - plan[key]
+                    if empty:
+                        batches.put((key, EMPTY, sorted(empty), None))
+                    continue
+                except Exception as e:
+                    error = e
+            batches.put((key, None, None, error))
+        batches.put(DONE)
+
+    threads = [
+        threading.Thread(target=fetch_all, name="pipeline-fetch", daemon=True),
+        threading.Thread(target=transform_all, name="pipeline-transform", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Loads stay on the calling thread, one transaction at a time
+    results = {}
+    while (item := batches.get()) is not DONE:
+        key, day, tables, error = item
+        if day is EMPTY:
+            try:
+                record_empty(sources[key], tables)
+            except Exception as e:
+                logger.error(f"{key}: dates without rows not recorded: {e}")
+            continue
+        if error is None:
+            try:
+                load_to_postgres(tables, mode=load_mode, source=sources[key])
+                results[(key, day)] = len(tables["sale_items"])
+                logger.info(f"{key} {day}: {results[(key, day)]} items loaded")
+                continue
+            except Exception as e:
+                error = e
+        results[(key, day)] = error
+        logger.error(f"{key} {day or ''}: ingestion failed: {error}")
+
+    for thread in threads:
+        thread.join()
+    return results
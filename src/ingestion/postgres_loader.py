@@ -1,8 +1,23 @@
+import hashlib
+import io
 import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
 import pandas as pd
 
+from .dimension_cache import get_dimension_cache
+from .manifest import record_load, table_counts
+from .validator import record_rejects, validate_before_load, validate_tables
+from ..analytics.rollups import DETAIL_TABLE, STAR_VIEW, refresh_rollups
 from ..utils.logger import setup_logger
+from ..utils.metrics import increment, track_stage
 
 logger = setup_logger(__name__)
 
@@ -24,15 +39,320 @@ LOOKUP_NAME_MAP = {
     "age_ranges": "age_range_label",
 }
 
+LOAD_MODES = ("copy", "rows", "parallel", "chunked", "values")
+
+# Rows per committed batch of the chunked load mode
+CHUNK_ROWS = int(os.getenv("PG_CHUNK_ROWS", "50000"))
+# Chunked loads without activity for this long are abandoned: dropped with
+# their staging tables by the next chunked load
+CHUNK_RETENTION_DAYS = int(os.getenv("PG_CHUNK_RETENTION_DAYS", "7"))
+
+# Rows per multi-row INSERT of the values load mode
+VALUES_PAGE_SIZE = int(os.getenv("PG_VALUES_PAGE_SIZE", "1000"))
+
+DIMENSION_TABLES = list(LOOKUP_NAME_MAP) + ["channels"]
+ENTITY_TABLES = ["customers", "products", "sales", "sale_items"]
+
+# Foreign keys of the DKNF schema, used to order merges in parallel mode
+TABLE_DEPENDENCIES = {
+    "customers": ["age_ranges", "countries"],
+    "products": ["categories", "brands", "colors", "sizes"],
+    "sales": ["customers", "channels"],
+    "sale_items": ["sales", "products"],
+}
+
+STAGING_TABLES = {
+    "customers": [
+        ("customer_id", "INTEGER"), ("first_name", "TEXT"), ("last_name", "TEXT"),
+        ("email", "TEXT"), ("gender", "TEXT"), ("age_range", "TEXT"),
+        ("signup_date", "DATE"), ("country", "TEXT"), ("row_hash", "TEXT"),
+    ],
+    "products": [
+        ("product_id", "INTEGER"), ("product_name", "TEXT"), ("category", "TEXT"),
+        ("brand", "TEXT"), ("color", "TEXT"), ("size", "TEXT"),
+        ("catalog_price", "NUMERIC(10, 2)"), ("cost_price", "NUMERIC(10, 2)"),
+        ("row_hash", "TEXT"),
+    ],
+    "sales": [
+        ("sale_id", "INTEGER"), ("sale_date", "DATE"),
+        ("customer_id", "INTEGER"), ("channel", "TEXT"),
+    ],
+    "sale_items": [
+        ("item_id", "INTEGER"), ("sale_id", "INTEGER"), ("sale_date", "DATE"),
+        ("product_id", "INTEGER"), ("quantity", "INTEGER"), ("original_price", "NUMERIC(10, 2)"),
+        ("discount_applied", "NUMERIC(10, 2)"),
+    ],
+}
+
+# LEFT JOINs on purpose: an unresolved lookup yields a NULL id, which the
+# NOT NULL foreign keys reject instead of silently dropping the row.
+# Shared rows are merged in key order so concurrent day loads lock them in
+# the same order and cannot deadlock.
+MERGE_SQL = {
+    "customers": (
+        "INSERT INTO customers "
+        "(customer_id, first_name, last_name, email, gender, age_range_id, signup_date, country_id, row_hash) "
+        "SELECT s.customer_id, s.first_name, s.last_name, s.email, s.gender::gender_enum, "
+        "ar.age_range_id, s.signup_date, co.country_id, s.row_hash "
+        "FROM {staging} s "
+        "LEFT JOIN age_ranges ar ON ar.age_range_label = s.age_range "
+        "LEFT JOIN countries co ON co.country_name = s.country "
+        "ORDER BY s.customer_id "
+        "ON CONFLICT (customer_id) DO UPDATE SET "
+        "first_name = EXCLUDED.first_name, last_name = EXCLUDED.last_name, email = EXCLUDED.email, "
+        "row_hash = EXCLUDED.row_hash "
+        "WHERE customers.row_hash IS DISTINCT FROM EXCLUDED.row_hash"
+    ),
+    "products": (
+        "INSERT INTO products "
+        "(product_id, product_name, category_id, brand_id, color_id, size_id, catalog_price, cost_price, row_hash) "
+        "SELECT s.product_id, s.product_name, cat.category_id, b.brand_id, col.color_id, sz.size_id, "
+        "s.catalog_price, s.cost_price, s.row_hash "
+        "FROM {staging} s "
+        "LEFT JOIN categories cat ON cat.category_name = s.category "
+        "LEFT JOIN brands b ON b.brand_name = s.brand "
+        "LEFT JOIN colors col ON col.color_name = s.color "
+        "LEFT JOIN sizes sz ON sz.size_label = s.size "
+        "ORDER BY s.product_id "
+        "ON CONFLICT (product_id) DO UPDATE SET "
+        "catalog_price = EXCLUDED.catalog_price, cost_price = EXCLUDED.cost_price, "
+        "row_hash = EXCLUDED.row_hash "
+        "WHERE products.row_hash IS DISTINCT FROM EXCLUDED.row_hash"
+    ),
+    "sales": (
+        "INSERT INTO sales (sale_id, sale_date, customer_id, channel_id) "
+        "SELECT s.sale_id, s.sale_date, s.customer_id, ch.channel_id "
+        "FROM {staging} s "
+        "LEFT JOIN channels ch ON ch.channel_name = s.channel "
+        "ON CONFLICT (sale_id, sale_date) DO NOTHING"
+    ),
+    "sale_items": (
+        "INSERT INTO sale_items "
+        "(item_id, sale_id, sale_date, product_id, quantity, original_price, discount_applied) "
+        "SELECT item_id, sale_id, sale_date, product_id, quantity, original_price, discount_applied "
+        "FROM {staging} "
+        "ON CONFLICT (item_id, sale_date) DO NOTHING"
+    ),
+}
+
+# Values mode: multi-row INSERTs for servers or poolers that refuse COPY.
+# Lookup names are mapped to their ids client-side, so each table is
+# (insert columns, {id column: (lookup table, name column)}, statement).
+VALUES_SQL = {
+    "customers": (
+        ["customer_id", "first_name", "last_name", "email", "gender", "age_range_id",
+         "signup_date", "country_id", "row_hash"],
+        {"age_range_id": ("age_ranges", "age_range"), "country_id": ("countries", "country")},
+        "INSERT INTO customers "
+        "(customer_id, first_name, last_name, email, gender, age_range_id, signup_date, country_id, row_hash) "
+        "VALUES %s "
+        "ON CONFLICT (customer_id) DO UPDATE SET "
+        "first_name = EXCLUDED.first_name, last_name = EXCLUDED.last_name, email = EXCLUDED.email, "
+        "row_hash = EXCLUDED.row_hash "
+        "WHERE customers.row_hash IS DISTINCT FROM EXCLUDED.row_hash",
+    ),
+    "products": (
+        ["product_id", "product_name", "category_id", "brand_id", "color_id", "size_id",
+         "catalog_price", "cost_price", "row_hash"],
+        {
+            "category_id": ("categories", "category"),
+            "brand_id": ("brands", "brand"),
+            "color_id": ("colors", "color"),
+            "size_id": ("sizes", "size"),
+        },
+        "INSERT INTO products "
+        "(product_id, product_name, category_id, brand_id, color_id, size_id, catalog_price, cost_price, row_hash) "
+        "VALUES %s "
+        "ON CONFLICT (product_id) DO UPDATE SET "
+        "catalog_price = EXCLUDED.catalog_price, cost_price = EXCLUDED.cost_price, "
+        "row_hash = EXCLUDED.row_hash "
+        "WHERE products.row_hash IS DISTINCT FROM EXCLUDED.row_hash",
+    ),
+    "sales": (
+        ["sale_id", "sale_date", "customer_id", "channel_id"],
+        {"channel_id": ("channels", "channel")},
+        "INSERT INTO sales (sale_id, sale_date, customer_id, channel_id) VALUES %s "
+        "ON CONFLICT (sale_id, sale_date) DO NOTHING",
+    ),
+    "sale_items": (
+        ["item_id", "sale_id", "sale_date", "product_id", "quantity", "original_price", "discount_applied"],
+        {},
+        "INSERT INTO sale_items "
+        "(item_id, sale_id, sale_date, product_id, quantity, original_price, discount_applied) VALUES %s "
+        "ON CONFLICT (item_id, sale_date) DO NOTHING",
+    ),
+}
+
+VALUES_PRICE_HISTORY_SQL = (
+    "INSERT INTO product_price_history (product_id, catalog_price, cost_price) "
+    "SELECT p.product_id, p.catalog_price, p.cost_price "
+    "FROM (VALUES %s) AS s(product_id, catalog_price, cost_price) "
+    "JOIN products p ON p.product_id = s.product_id "
+    "WHERE (p.catalog_price, p.cost_price) IS DISTINCT FROM (s.catalog_price::numeric, s.cost_price::numeric)"
+)
+
+# Archives the current prices of products about to be repriced
+PRICE_HISTORY_SQL = (
+    "INSERT INTO product_price_history (product_id, catalog_price, cost_price) "
+    "SELECT p.product_id, p.catalog_price, p.cost_price "
+    "FROM {staging} s JOIN products p ON p.product_id = s.product_id "
+    "WHERE (p.catalog_price, p.cost_price) IS DISTINCT FROM (s.catalog_price, s.cost_price)"
+)
+
+HASH_KEYS = {"customers": "customer_id", "products": "product_id"}
+
+# Monthly partitions of sales / sale_items (sql/05_partition_sales.sql)
+PARTITION_SQL = "SELECT create_sales_partitions(%s::date[])"
+
+# Child rows first: sale_items references sales
+REPLACE_DAYS_SQL = {
+    "sale_items": "DELETE FROM sale_items WHERE sale_date = ANY(%s)",
+    "sales": "DELETE FROM sales WHERE sale_date = ANY(%s)",
+}
+
+# Materialized star schema (sql/04_star_schema_tables.sql): the loaded dates
+# are rebuilt from the DKNF tables, totals from the refreshed fact rows.
+STAR_REFRESH_SQL = {
+    "fact_sale_items": (
+        "DELETE FROM fact_sale_items WHERE sale_date = ANY(%s)",
+        "INSERT INTO fact_sale_items SELECT * FROM v_star_schema "
+        "WHERE sale_date = ANY(%s) ORDER BY item_id",
+    ),
+    "fact_sale_totals": (
+        "DELETE FROM fact_sale_totals WHERE sale_date = ANY(%s)",
+        "INSERT INTO fact_sale_totals (sale_id, sale_date, customer_id, channel, item_count, total_amount) "
+        "SELECT sale_id, sale_date, customer_id, channel, count(*), SUM(item_total) "
+        "FROM fact_sale_items WHERE sale_date = ANY(%s) "
+        "GROUP BY sale_id, sale_date, customer_id, channel ORDER BY sale_id",
+    ),
+}
+
+# Customer and product columns an upsert may rewrite, copied onto fact rows
+# of dates that were not reloaded. Each returns the touched dates with their
+# row counts.
+STAR_ATTRIBUTE_SQL = {
+    "customers": (
+        "WITH updated AS ("
+        "UPDATE fact_sale_items f SET "
+        "first_name = c.first_name, last_name = c.last_name, email = c.email "
+        "FROM customers c WHERE c.customer_id = ANY(%s) AND f.customer_id = c.customer_id "
+        "AND (f.first_name, f.last_name, f.email) IS DISTINCT FROM (c.first_name, c.last_name, c.email) "
+        "RETURNING f.sale_date"
+        ") SELECT sale_date, count(*) FROM updated GROUP BY sale_date"
+    ),
+    "products": (
+        "WITH updated AS ("
+        "UPDATE fact_sale_items f SET "
+        "catalog_price = p.catalog_price, cost_price = p.cost_price "
+        "FROM products p WHERE p.product_id = ANY(%s) AND f.product_id = p.product_id "
+        "AND (f.catalog_price, f.cost_price) IS DISTINCT FROM (p.catalog_price, p.cost_price) "
+        "RETURNING f.sale_date"
+        ") SELECT sale_date, count(*) FROM updated GROUP BY sale_date"
+    ),
+}
+
+# Without maintained fact rows to compare against, every date holding a
+# new or changed customer / product (STAR_TABLES_REFRESH=0)
+CHANGED_DATES_SQL = {
+    "customers": "SELECT DISTINCT sale_date FROM sales WHERE customer_id = ANY(%s)",
+    "products": "SELECT DISTINCT sale_date FROM sale_items WHERE product_id = ANY(%s)",
+}
+
+# Product prices feed the margin columns of the daily rollups
+ROLLUP_ATTRIBUTES = {"products"}
+
+# Dates whose star schema rows changed, read by incremental exports
+# (sql/11_star_date_changes.sql). clock_timestamp(): the load transaction
+# may have started long before.
+STAR_CHANGES_SQL = (
+    "INSERT INTO star_date_changes (sale_date) SELECT unnest(%s::date[]) "
+    "ON CONFLICT (sale_date) DO UPDATE SET changed_at = clock_timestamp()"
+)
+
+# Batches of a chunked load already copied to its staging tables
+# (sql/08_load_checkpoints.sql)
+CHECKPOINT_SELECT_SQL = "SELECT table_name, chunk FROM load_checkpoints WHERE load_key = %s AND chunk >= 0"
+# Chunk -1 marks a started load, so staging tables without any committed
+# chunk are found by the cleanup too; a retry renews it
+CHECKPOINT_START_SQL = (
+    "INSERT INTO load_checkpoints (load_key, table_name, chunk, row_count) VALUES (%s, '*', -1, 0) "
+    "ON CONFLICT (load_key, table_name, chunk) DO UPDATE SET loaded_at = now()"
+)
+CHECKPOINT_STALE_SQL = (
+    "SELECT load_key FROM load_checkpoints WHERE load_key <> %s "
+    "GROUP BY load_key HAVING max(loaded_at) < now() - make_interval(days => %s)"
+)
+CHECKPOINT_INSERT_SQL = (
+    "INSERT INTO load_checkpoints (load_key, table_name, chunk, row_count) VALUES (%s, %s, %s, %s)"
+)
+CHECKPOINT_DELETE_SQL = "DELETE FROM load_checkpoints WHERE load_key = %s"
+
+
+def track_price_history():
+    return os.getenv("PRODUCT_PRICE_HISTORY", "1") == "1"
+
+
+def refresh_star():
+    return os.getenv("STAR_TABLES_REFRESH", "1") == "1"
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        increment("db_round_trips")
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        increment("db_round_trips", len(vars_list))
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        increment("db_round_trips")
+        return super().copy_expert(sql, file, size)
+
+
+def connection_params():
+    return {
+        "cursor_factory": CountingCursor,
+        "host": os.getenv("PG_HOST", "postgres"),
+        "port": os.getenv("PG_PORT", "5432"),
+        "dbname": os.getenv("PG_DB", "fashion_store"),
+        "user": os.getenv("PG_USER", "fashion"),
+        "password": os.getenv("PG_PASSWORD", "fashion123"),
+    }
+
+
+def keep_connections():
+    # Set by the long-running worker: connections are borrowed from the pool
+    # and handed back, instead of being opened and closed for each load
+    return os.getenv("PG_KEEP_CONNECTIONS", "0") == "1"
+
 
 def get_connection():
-    return psycopg2.connect(
-        host=os.getenv("PG_HOST", "postgres"),
-        port=os.getenv("PG_PORT", "5432"),
-        dbname=os.getenv("PG_DB", "fashion_store"),
-        user=os.getenv("PG_USER", "fashion"),
-        password=os.getenv("PG_PASSWORD", "fashion123"),
-    )
+    if keep_connections():
+        return get_pool().getconn()
+    return psycopg2.connect(**connection_params())
+
+
+def release_connection(conn):
+    if keep_connections():
+        # The pool rolls back whatever the connection left open
+        get_pool().putconn(conn)
+    else:
+        conn.close()
+
+
+@lru_cache(maxsize=None)
+def get_pool():
+    pool_size = int(os.getenv("PG_POOL_SIZE", "4"))
+    if pool_size < 1:
+        raise ValueError("PG_POOL_SIZE must be at least 1")
+    # psycopg2 closes a returned connection once minconn are idle: keeping
+    # them all open is what saves the reconnects between loads
+    pool_min = int(os.getenv("PG_POOL_MIN", str(pool_size)))
+    if not 0 <= pool_min <= pool_size:
+        raise ValueError("PG_POOL_MIN must be between 0 and PG_POOL_SIZE")
+    logger.info(f"Opening PostgreSQL pool of {pool_size} connections ({pool_min} kept open)")
+    return psycopg2.pool.ThreadedConnectionPool(pool_min, pool_size, **connection_params())
 
 
 def upsert_lookup(cur, table, values):
@@ -49,106 +369,599 @@ def upsert_lookup(cur, table, values):
     return {row[1]: row[0] for row in cur.fetchall()}
 
 
-def load_to_postgres(tables):
-    conn = get_connection()
+def create_staging(cur, table, staging, temporary=True):
+    col_defs = ", ".join(f"{name} {col_type}" for name, col_type in STAGING_TABLES[table])
+    if temporary:
+        cur.execute(f"CREATE TEMP TABLE {staging} ({col_defs}) ON COMMIT DROP")
+    else:
+        cur.execute(f"CREATE UNLOGGED TABLE {staging} ({col_defs})")
+
+
+def copy_frame(cur, table, staging, df):
+    col_names = [name for name, _ in STAGING_TABLES[table]]
+    buf = io.StringIO()
+    df[col_names].to_csv(buf, index=False, header=False, na_rep="\\N")
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {staging} ({', '.join(col_names)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buf,
+    )
+
+
+def copy_to_staging(cur, table, df):
+    create_staging(cur, table, f"stg_{table}")
+    copy_frame(cur, table, f"stg_{table}", df)
+
+
+def load_dimensions_cached(cur, tables):
+    cache = get_dimension_cache()
+    maps = {}
+    for table in DIMENSION_TABLES:
+        with track_stage("load", table=table, rows_in=len(tables[table])) as stage:
+            maps[table] = cache.resolve(cur, table, tables[table])
+            stage["rows_out"] = len(maps[table])
+    logger.info("Lookup tables loaded")
+    return maps
+
+
+def skip_unchanged(cur, tables):
+    tables = dict(tables)
+    for table, key in HASH_KEYS.items():
+        df = tables[table]
+        cur.execute(
+            f"SELECT {key}, row_hash FROM {table} WHERE {key} = ANY(%s)",
+            (df[key].astype(int).tolist(),),
+        )
+        stored = dict(cur.fetchall())
+        changed = df[df[key].map(stored) != df["row_hash"]]
+        if len(changed) < len(df):
+            logger.info(f"{len(df) - len(changed)} unchanged {table} skipped")
+        tables[table] = changed
+    return tables
+
+
+def merge_staging(cur, table, staging):
+    if table == "products" and track_price_history():
+        cur.execute(PRICE_HISTORY_SQL.format(staging=staging))
+        if cur.rowcount:
+            logger.info(f"{cur.rowcount} product price changes archived")
+    cur.execute(MERGE_SQL[table].format(staging=staging))
+
+
+def sale_dates(tables):
+    return sorted(set(tables["sales"]["sale_date"]))
+
+
+def ensure_partitions(conn, tables):
+    # Own short transaction: creating a partition locks the parent tables
+    with conn.cursor() as cur:
+        cur.execute(PARTITION_SQL, (sale_dates(tables),))
+        created = cur.fetchone()[0]
+    conn.commit()
+    if created:
+        logger.info(f"{created} sales partitions created")
+
+
+def replace_days(cur, tables):
+    dates = sale_dates(tables)
+    for table, sql in REPLACE_DAYS_SQL.items():
+        cur.execute(sql, (dates,))
+        logger.info(f"{cur.rowcount} {table.replace('_', ' ')} deleted for {len(dates)} dates")
+
+
+def refresh_star_tables(cur, tables):
+    dates = sale_dates(tables)
+    # STAR_TABLES_REFRESH=0 only skips the fact tables: rollups and the
+    # change dates read by incremental exports are kept up to date
+    facts = refresh_star()
+    if facts:
+        for table, (delete_sql, insert_sql) in STAR_REFRESH_SQL.items():
+            with track_stage("refresh", table=table) as stage:
+                cur.execute(delete_sql, (dates,))
+                cur.execute(insert_sql, (dates,))
+                stage["rows_out"] = cur.rowcount
+            logger.info(f"{table}: {cur.rowcount} rows refreshed for {len(dates)} dates")
+
+    rollup_dates = set(dates)
+    changed_dates = set(dates)
+    for table, key in HASH_KEYS.items():
+        if tables[table].empty:
+            continue
+        ids = tables[table][key].astype(int).tolist()
+        if facts:
+            cur.execute(STAR_ATTRIBUTE_SQL[table], (ids,))
+            touched = dict(cur.fetchall())
+            if touched:
+                logger.info(f"fact_sale_items: {sum(touched.values())} rows updated from changed {table}")
+        else:
+            cur.execute(CHANGED_DATES_SQL[table], (ids,))
+            touched = {row[0] for row in cur.fetchall()}
+        changed_dates.update(touched)
+        if table in ROLLUP_ATTRIBUTES:
+            rollup_dates.update(touched)
+
+    refresh_rollups(cur, sorted(rollup_dates), DETAIL_TABLE if facts else STAR_VIEW)
+    cur.execute(STAR_CHANGES_SQL, (sorted(changed_dates),))
+
+
+def load_copy(cur, tables):
+    load_dimensions_cached(cur, tables)
+    tables = skip_unchanged(cur, tables)
+
+    for table in ENTITY_TABLES:
+        with track_stage("load", table=table, rows_in=len(tables[table])) as stage:
+            copy_to_staging(cur, table, tables[table])
+            merge_staging(cur, table, f"stg_{table}")
+            stage["rows_out"] = cur.rowcount
+        logger.info(f"{len(tables[table])} {table.replace('_', ' ')} upserted")
+
+    refresh_star_tables(cur, tables)
+
+
+def column_rows(df, columns):
+    # One conversion per column, then tuples: NaN becomes NULL
+    arrays = [df[col].astype(object).where(df[col].notna(), None).tolist() for col in columns]
+    return list(zip(*arrays))
+
+
+def execute_batches(cur, sql, rows):
+    psycopg2.extras.execute_values(cur, sql, rows, page_size=VALUES_PAGE_SIZE)
+
+
+def load_values(cur, tables):
+    maps = load_dimensions_cached(cur, tables)
+    tables = skip_unchanged(cur, tables)
+
+    for table in ENTITY_TABLES:
+        columns, lookups, sql = VALUES_SQL[table]
+        df = tables[table]
+        if table in HASH_KEYS:
+            df = df.sort_values(HASH_KEYS[table])
+        df = df.assign(**{
+            id_col: df[name_col].map(maps[lookup]).astype("Int64")
+            for id_col, (lookup, name_col) in lookups.items()
+        })
+
+        with track_stage("load", table=table, rows_in=len(df)) as stage:
+            if table == "products" and track_price_history() and not df.empty:
+                execute_batches(
+                    cur, VALUES_PRICE_HISTORY_SQL,
+                    column_rows(df, ["product_id", "catalog_price", "cost_price"]),
+                )
+            execute_batches(cur, sql, column_rows(df, columns))
+            stage["rows_out"] = len(df)
+        logger.info(f"{len(df)} {table.replace('_', ' ')} upserted")
+
+    refresh_star_tables(cur, tables)
+
+
+def load_dimensions_rows(cur, tables):
+    maps = {
+        table: upsert_lookup(cur, table, tables[table][name_col].tolist())
+        for table, name_col in LOOKUP_NAME_MAP.items()
+    }
+
+    for _, row in tables["channels"].iterrows():
+        cur.execute(
+            "INSERT INTO channels (channel_name, campaign_name) VALUES (%s, %s) "
+            "ON CONFLICT (channel_name) DO NOTHING",
+            (row["channel_name"], row["campaign_name"]),
+        )
+    cur.execute("SELECT channel_id, channel_name FROM channels")
+    maps["channels"] = {r[1]: r[0] for r in cur.fetchall()}
+    logger.info("Lookup tables loaded")
+    return maps
+
+
+def load_rows(cur, tables):
+    maps = load_dimensions_rows(cur, tables)
+    country_map = maps["countries"]
+    category_map = maps["categories"]
+    brand_map = maps["brands"]
+    color_map = maps["colors"]
+    size_map = maps["sizes"]
+    age_range_map = maps["age_ranges"]
+    channel_map = maps["channels"]
+    tables = skip_unchanged(cur, tables)
+
+    for _, row in tables["customers"].sort_values("customer_id").iterrows():
+        cur.execute(
+            "INSERT INTO customers "
+            "(customer_id, first_name, last_name, email, gender, age_range_id, signup_date, country_id, row_hash) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) "
+            "ON CONFLICT (customer_id) DO UPDATE SET "
+            "first_name = EXCLUDED.first_name, last_name = EXCLUDED.last_name, email = EXCLUDED.email, "
+            "row_hash = EXCLUDED.row_hash "
+            "WHERE customers.row_hash IS DISTINCT FROM EXCLUDED.row_hash",
+            (
+                int(row["customer_id"]),
+                row["first_name"] if pd.notna(row["first_name"]) else None,
+                row["last_name"] if pd.notna(row["last_name"]) else None,
+                row["email"] if pd.notna(row["email"]) else None,
+                row["gender"],
+                age_range_map[row["age_range"]],
+                row["signup_date"],
+                country_map[row["country"]],
+                row["row_hash"],
+            ),
+        )
+    logger.info(f"{len(tables['customers'])} customers upserted")
+
+    for _, row in tables["products"].sort_values("product_id").iterrows():
+        if track_price_history():
+            cur.execute(
+                "INSERT INTO product_price_history (product_id, catalog_price, cost_price) "
+                "SELECT product_id, catalog_price, cost_price FROM products "
+                "WHERE product_id = %s AND (catalog_price, cost_price) IS DISTINCT FROM (%s::numeric, %s::numeric)",
+                (int(row["product_id"]), float(row["catalog_price"]), float(row["cost_price"])),
+            )
+        cur.execute(
+            "INSERT INTO products "
+            "(product_id, product_name, category_id, brand_id, color_id, size_id, catalog_price, cost_price, row_hash) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) "
+            "ON CONFLICT (product_id) DO UPDATE SET "
+            "catalog_price = EXCLUDED.catalog_price, cost_price = EXCLUDED.cost_price, "
+            "row_hash = EXCLUDED.row_hash "
+            "WHERE products.row_hash IS DISTINCT FROM EXCLUDED.row_hash",
+            (
+                int(row["product_id"]),
+                row["product_name"],
+                category_map[row["category"]],
+                brand_map[row["brand"]],
+                color_map[row["color"]],
+                size_map[str(row["size"])],
+                float(row["catalog_price"]),
+                float(row["cost_price"]),
+                row["row_hash"],
+            ),
+        )
+    logger.info(f"{len(tables['products'])} products upserted")
+
+    for _, row in tables["sales"].iterrows():
+        cur.execute(
+            "INSERT INTO sales (sale_id, sale_date, customer_id, channel_id) "
+            "VALUES (%s, %s, %s, %s) "
+            "ON CONFLICT (sale_id, sale_date) DO NOTHING",
+            (
+                int(row["sale_id"]),
+                row["sale_date"],
+                int(row["customer_id"]),
+                channel_map[row["channel"]],
+            ),
+        )
+    logger.info(f"{len(tables['sales'])} sales upserted")
+
+    for _, row in tables["sale_items"].iterrows():
+        cur.execute(
+            "INSERT INTO sale_items "
+            "(item_id, sale_id, sale_date, product_id, quantity, original_price, discount_applied) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s) "
+            "ON CONFLICT (item_id, sale_date) DO NOTHING",
+            (
+                int(row["item_id"]),
+                int(row["sale_id"]),
+                row["sale_date"],
+                int(row["product_id"]),
+                int(row["quantity"]),
+                float(row["original_price"]),
+                float(row["discount_applied"]),
+            ),
+        )
+    logger.info(f"{len(tables['sale_items'])} sale items upserted")
+
+    refresh_star_tables(cur, tables)
+
+
+def dependency_levels(tables):
+    levels = []
+    done = set(DIMENSION_TABLES)
+    remaining = [table for table in tables if table not in done]
+    while remaining:
+        level = [t for t in remaining if all(dep in done for dep in TABLE_DEPENDENCIES.get(t, []))]
+        if not level:
+            raise ValueError(f"Circular dependency between {remaining}")
+        levels.append(level)
+        done.update(level)
+        remaining = [t for t in remaining if t not in done]
+    return levels
+
+
+def stage_table(pool, table, staging, df):
+    start = time.perf_counter()
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur, track_stage("copy", table=table, rows_in=len(df)) as stage:
+            create_staging(cur, table, staging, temporary=False)
+            copy_frame(cur, table, staging, df)
+            stage["rows_out"] = cur.rowcount
+    finally:
+        pool.putconn(conn)
+    return time.perf_counter() - start
+
+
+def drop_staging(pool, staging_tables):
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for staging in staging_tables:
+                cur.execute(f"DROP TABLE IF EXISTS {staging}")
+    finally:
+        pool.putconn(conn)
+
+
+def load_parallel(tables, pool=None, replace=False, source=None):
+    pool = pool or get_pool()
+    if pool.maxconn < 2:
+        # One connection holds the load transaction, the others copy staging tables
+        raise ValueError("PG_POOL_SIZE must be at least 2 for the parallel load mode")
+    token = uuid.uuid4().hex[:12]
+    staging = {table: f"stg_{table}_{token}" for table in ENTITY_TABLES}
+    timings = {table: {} for table in DIMENSION_TABLES + ENTITY_TABLES}
+    cache = get_dimension_cache()
+    logger.info(f"Loading with mode 'parallel' on {pool.maxconn} connections")
+
+    conn = pool.getconn()
     try:
         conn.autocommit = False
+        ensure_partitions(conn, tables)
         cur = conn.cursor()
+        tables = skip_unchanged(cur, tables)
 
-        country_map = upsert_lookup(cur, "countries", tables["countries"]["country_name"].tolist())
-        category_map = upsert_lookup(cur, "categories", tables["categories"]["category_name"].tolist())
-        brand_map = upsert_lookup(cur, "brands", tables["brands"]["brand_name"].tolist())
-        color_map = upsert_lookup(cur, "colors", tables["colors"]["color_name"].tolist())
-        size_map = upsert_lookup(cur, "sizes", tables["sizes"]["size_label"].tolist())
-        age_range_map = upsert_lookup(cur, "age_ranges", tables["age_ranges"]["age_range_label"].tolist())
+        # Entity tables are copied into unlogged staging tables on the other
+        # pooled connections while this transaction resolves the dimensions.
+        with ThreadPoolExecutor(max_workers=max(1, pool.maxconn - 1)) as executor:
+            copies = {
+                table: executor.submit(stage_table, pool, table, staging[table], tables[table])
+                for table in ENTITY_TABLES
+            }
 
-        for _, row in tables["channels"].iterrows():
-            cur.execute(
-                "INSERT INTO channels (channel_name, campaign_name) VALUES (%s, %s) "
-                "ON CONFLICT (channel_name) DO NOTHING",
-                (row["channel_name"], row["campaign_name"]),
-            )
-        cur.execute("SELECT channel_id, channel_name FROM channels")
-        channel_map = {r[1]: r[0] for r in cur.fetchall()}
-        logger.info("Lookup tables loaded")
+            for table in DIMENSION_TABLES:
+                start = time.perf_counter()
+                with track_stage("load", table=table, rows_in=len(tables[table])) as stage:
+                    stage["rows_out"] = len(cache.resolve(cur, table, tables[table]))
+                timings[table]["merge"] = time.perf_counter() - start
+            logger.info("Lookup tables loaded")
 
-        for _, row in tables["customers"].iterrows():
-            cur.execute(
-                "INSERT INTO customers "
-                "(customer_id, first_name, last_name, email, gender, age_range_id, signup_date, country_id) "
-                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
-                "ON CONFLICT (customer_id) DO UPDATE SET "
-                "first_name = EXCLUDED.first_name, last_name = EXCLUDED.last_name, email = EXCLUDED.email",
-                (
-                    int(row["customer_id"]),
-                    row["first_name"] if pd.notna(row["first_name"]) else None,
-                    row["last_name"] if pd.notna(row["last_name"]) else None,
-                    row["email"] if pd.notna(row["email"]) else None,
-                    row["gender"],
-                    age_range_map[row["age_range"]],
-                    row["signup_date"],
-                    country_map[row["country"]],
-                ),
-            )
-        logger.info(f"{len(tables['customers'])} customers upserted")
+            for table, future in copies.items():
+                timings[table]["copy"] = future.result()
 
-        for _, row in tables["products"].iterrows():
-            cur.execute(
-                "INSERT INTO products "
-                "(product_id, product_name, category_id, brand_id, color_id, size_id, catalog_price, cost_price) "
-                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
-                "ON CONFLICT (product_id) DO NOTHING",
-                (
-                    int(row["product_id"]),
-                    row["product_name"],
-                    category_map[row["category"]],
-                    brand_map[row["brand"]],
-                    color_map[row["color"]],
-                    size_map[str(row["size"])],
-                    float(row["catalog_price"]),
-                    float(row["cost_price"]),
-                ),
-            )
-        logger.info(f"{len(tables['products'])} products upserted")
+        if replace:
+            replace_days(cur, tables)
 
-        for _, row in tables["sales"].iterrows():
-            cur.execute(
-                "INSERT INTO sales (sale_id, sale_date, customer_id, channel_id) "
-                "VALUES (%s, %s, %s, %s) "
-                "ON CONFLICT (sale_id) DO NOTHING",
-                (
-                    int(row["sale_id"]),
-                    row["sale_date"],
-                    int(row["customer_id"]),
-                    channel_map[row["channel"]],
-                ),
-            )
-        logger.info(f"{len(tables['sales'])} sales upserted")
+        for level in dependency_levels(ENTITY_TABLES):
+            for table in level:
+                start = time.perf_counter()
+                with track_stage("load", table=table, rows_in=len(tables[table])) as stage:
+                    merge_staging(cur, table, staging[table])
+                    stage["rows_out"] = cur.rowcount
+                timings[table]["merge"] = time.perf_counter() - start
+                logger.info(f"{len(tables[table])} {table.replace('_', ' ')} upserted")
 
-        for _, row in tables["sale_items"].iterrows():
-            cur.execute(
-                "INSERT INTO sale_items "
-                "(item_id, sale_id, product_id, quantity, original_price, discount_applied) "
-                "VALUES (%s, %s, %s, %s, %s, %s) "
-                "ON CONFLICT (item_id) DO NOTHING",
-                (
-                    int(row["item_id"]),
-                    int(row["sale_id"]),
-                    int(row["product_id"]),
-                    int(row["quantity"]),
-                    float(row["original_price"]),
-                    float(row["discount_applied"]),
-                ),
-            )
-        logger.info(f"{len(tables['sale_items'])} sale items upserted")
+        start = time.perf_counter()
+        refresh_star_tables(cur, tables)
+        timings["fact_sale_items"] = {"refresh": time.perf_counter() - start}
+
+        if source:
+            record_load(cur, source, table_counts(tables))
 
         conn.commit()
+        cache.commit()
         cur.close()
         logger.info("Transaction committed")
 
     except Exception as e:
         conn.rollback()
+        cache.rollback()
         logger.error(f"Load failed, rolled back: {e}")
         raise
     finally:
-        conn.close()
+        pool.putconn(conn)
+        drop_staging(pool, staging.values())
+
+    for table, timing in timings.items():
+        logger.info(f"{table}: " + ", ".join(f"{step} {secs:.3f}s" for step, secs in timing.items()))
+    return timings
+
+
+def load_key(tables):
+    # Same input, same key: a retried run finds its staging tables and checkpoints
+    digest = hashlib.md5()
+    for day in sale_dates(tables):
+        digest.update(str(day).encode())
+    for table in ENTITY_TABLES:
+        digest.update(pd.util.hash_pandas_object(tables[table], index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def create_chunk_staging(cur, table, staging):
+    # Logged, unlike the parallel staging tables: committed chunks must
+    # survive a server restart to be resumed
+    col_defs = ", ".join(f"{name} {col_type}" for name, col_type in STAGING_TABLES[table])
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {staging} ({col_defs})")
+
+
+def drop_stale_loads(cur, key, max_age_days=None):
+    # Loads that failed and were never retried with the same data, e.g.
+    # because the source was corrected in the meantime
+    max_age_days = CHUNK_RETENTION_DAYS if max_age_days is None else max_age_days
+    cur.execute(CHECKPOINT_STALE_SQL, (key, max_age_days))
+    stale = [row[0] for row in cur.fetchall()]
+    for stale_key in stale:
+        for table in ENTITY_TABLES:
+            cur.execute(f"DROP TABLE IF EXISTS stg_{table}_{stale_key}")
+        cur.execute(CHECKPOINT_DELETE_SQL, (stale_key,))
+    if stale:
+        logger.info(f"Dropped {len(stale)} chunked loads idle for more than {max_age_days} days")
+    return stale
+
+
+def stage_chunks(conn, cur, key, table, staging, df, done, chunk_rows):
+    staged = 0
+    for chunk, start in enumerate(range(0, len(df), chunk_rows)):
+        if (table, chunk) in done:
+            continue
+        part = df.iloc[start:start + chunk_rows]
+        copy_frame(cur, table, staging, part)
+        cur.execute(CHECKPOINT_INSERT_SQL, (key, table, chunk, len(part)))
+        conn.commit()
+        staged += len(part)
+    return staged
+
+
+def load_chunked(tables, conn=None, replace=False, source=None, chunk_rows=None):
+    chunk_rows = chunk_rows or CHUNK_ROWS
+    conn = conn or get_connection()
+    conn.cursor_factory = CountingCursor
+    key = load_key(tables)
+    staging = {table: f"stg_{table}_{key}" for table in ENTITY_TABLES}
+    cache = get_dimension_cache()
+    logger.info(f"Loading with mode 'chunked' ({chunk_rows} rows per chunk, load {key})")
+
+    try:
+        conn.autocommit = False
+        ensure_partitions(conn, tables)
+        cur = conn.cursor()
+        drop_stale_loads(cur, key)
+        for table in ENTITY_TABLES:
+            create_chunk_staging(cur, table, staging[table])
+        cur.execute(CHECKPOINT_START_SQL, (key,))
+        cur.execute(CHECKPOINT_SELECT_SQL, (key,))
+        done = set(cur.fetchall())
+        conn.commit()
+        if done:
+            logger.info(f"Resuming load {key}: {len(done)} chunks already staged")
+
+        # Each chunk commits with its checkpoint: a failure only loses the
+        # chunk in flight, and readers see nothing until the publish below.
+        for table in ENTITY_TABLES:
+            df = tables[table]
+            with track_stage("copy", table=table, rows_in=len(df)) as stage:
+                stage["rows_out"] = stage_chunks(conn, cur, key, table, staging[table], df, done, chunk_rows)
+            logger.info(f"{stage['rows_out']} {table.replace('_', ' ')} staged")
+
+        with track_stage("load", table="all", rows_in=sum(len(df) for df in tables.values())):
+            load_dimensions_cached(cur, tables)
+            changed = skip_unchanged(cur, tables)
+            if replace:
+                replace_days(cur, tables)
+            for table in ENTITY_TABLES:
+                with track_stage("load", table=table, rows_in=len(tables[table])) as stage:
+                    merge_staging(cur, table, staging[table])
+                    stage["rows_out"] = cur.rowcount
+                logger.info(f"{len(tables[table])} {table.replace('_', ' ')} upserted")
+            refresh_star_tables(cur, changed)
+
+        if source:
+            record_load(cur, source, table_counts(tables))
+        cur.execute(CHECKPOINT_DELETE_SQL, (key,))
+        for staging_table in staging.values():
+            cur.execute(f"DROP TABLE {staging_table}")
+
+        conn.commit()
+        cache.commit()
+        cur.close()
+        logger.info(f"Load {key} published")
+
+    except Exception as e:
+        conn.rollback()
+        cache.rollback()
+        logger.error(f"Load {key} failed, staged chunks kept for a retry: {e}")
+        raise
+    finally:
+        release_connection(conn)
+
+
+def resolve_mode(mode=None):
+    mode = mode or os.getenv("PG_LOAD_MODE", "copy")
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown load mode '{mode}', expected one of {LOAD_MODES}")
+    return mode
+
+
+def run_in_transaction(loaders, tables, mode, conn=None, replace=False, source=None):
+    conn = conn or get_connection()
+    conn.cursor_factory = CountingCursor
+    try:
+        conn.autocommit = False
+        if "sales" in tables:
+            ensure_partitions(conn, tables)
+        cur = conn.cursor()
+
+        logger.info(f"Loading with mode '{mode}'")
+        with track_stage("load", table="all", rows_in=sum(len(df) for df in tables.values())):
+            if replace:
+                replace_days(cur, tables)
+            loaders[mode](cur, tables)
+        if source:
+            record_load(cur, source, table_counts(tables))
+
+        conn.commit()
+        get_dimension_cache().commit()
+        cur.close()
+        logger.info("Transaction committed")
+
+    except Exception as e:
+        conn.rollback()
+        get_dimension_cache().rollback()
+        logger.error(f"Load failed, rolled back: {e}")
+        raise
+    finally:
+        release_connection(conn)
+
+
+def quarantine_rejects(rejects, conn=None):
+    # Own short transaction, committed before the load starts
+    own_conn = conn is None
+    conn = conn or get_connection()
+    try:
+        with conn.cursor() as cur:
+            record_rejects(cur, rejects)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            release_connection(conn)
+
+
+def validate(tables, conn=None):
+    if not validate_before_load():
+        return tables
+    tables, rejects = validate_tables(tables)
+    if not rejects.empty:
+        quarantine_rejects(rejects, conn)
+    return tables
+
+
+def load_dimensions(tables, mode=None, conn=None):
+    mode = resolve_mode(mode)
+    tables = validate(tables, conn)
+    loaders = {
+        "copy": load_dimensions_cached,
+        "rows": load_dimensions_rows,
+        "parallel": load_dimensions_cached,
+        "chunked": load_dimensions_cached,
+        "values": load_dimensions_cached,
+    }
+    run_in_transaction(loaders, tables, mode, conn)
+
+
+def load_to_postgres(tables, mode=None, conn=None, replace=False, source=None):
+    mode = resolve_mode(mode)
+    tables = validate(tables, conn)
+    if mode == "parallel":
+        # The parallel loader works on its own pool, opened from the PG_*
+        # settings: a given connection could point at another database
+        if conn is not None:
+            raise ValueError(
+                "The parallel load mode runs on the PG_* connection pool and cannot use a given connection"
+            )
+        with track_stage("load", table="all", rows_in=sum(len(df) for df in tables.values())):
+            return load_parallel(tables, replace=replace, source=source)
+    if mode == "chunked":
+        return load_chunked(tables, conn, replace, source)
+    loaders = {"copy": load_copy, "rows": load_rows, "values": load_values}
+    run_in_transaction(loaders, tables, mode, conn, replace, source)
@@ -1,92 +1,167 @@
+import hashlib
+
 import pandas as pd
+from pandas.api.types import union_categoricals
 
 from ..utils.logger import setup_logger
+from ..utils.metrics import track_stage
 
 logger = setup_logger(__name__)
 
-
-def transform_and_split(df, target_date):
-    df["sale_date"] = pd.to_datetime(df["sale_date"]).dt.date
-
-    filtered = df[df["sale_date"] == target_date].copy()
-    if filtered.empty:
-        return None
-
-    logger.info(f"{len(filtered)} rows matched {target_date}")
-
-    countries = (
-        filtered[["country"]]
-        .drop_duplicates()
-        .rename(columns={"country": "country_name"})
-    )
-
-    categories = (
-        filtered[["category"]]
-        .drop_duplicates()
-        .rename(columns={"category": "category_name"})
-    )
-
-    brands = (
-        filtered[["brand"]]
-        .drop_duplicates()
-        .rename(columns={"brand": "brand_name"})
-    )
-
-    colors = (
-        filtered[["color"]]
-        .drop_duplicates()
-        .rename(columns={"color": "color_name"})
-    )
-
-    sizes = (
-        filtered[["size"]]
-        .drop_duplicates()
-        .rename(columns={"size": "size_label"})
-    )
-    sizes["size_label"] = sizes["size_label"].astype(str)
-
-    age_ranges = (
-        filtered[["age_range"]]
-        .drop_duplicates()
-        .rename(columns={"age_range": "age_range_label"})
-    )
-
-    channels = (
-        filtered[["channel", "channel_campaigns"]]
-        .drop_duplicates()
-        .rename(columns={"channel": "channel_name", "channel_campaigns": "campaign_name"})
-    )
-
-    customers = filtered.drop_duplicates(subset=["customer_id"])[
-        ["customer_id", "first_name", "last_name", "email", "gender",
-         "age_range", "signup_date", "country"]
-    ].copy()
-
-    products = filtered.drop_duplicates(subset=["product_id"])[
-        ["product_id", "product_name", "category", "brand", "color",
-         "size", "catalog_price", "cost_price"]
-    ].copy()
-    products["size"] = products["size"].astype(str)
-
-    sales = filtered.drop_duplicates(subset=["sale_id"])[
-        ["sale_id", "sale_date", "customer_id", "channel"]
-    ].copy()
-
-    sale_items = filtered[
-        ["item_id", "sale_id", "product_id", "quantity",
-         "original_price", "discount_applied"]
-    ].copy()
-
-    return {
-        "countries": countries,
-        "categories": categories,
-        "brands": brands,
-        "colors": colors,
-        "sizes": sizes,
-        "age_ranges": age_ranges,
-        "channels": channels,
+SOURCE_COLUMNS = [
+    "sale_date", "item_id", "sale_id", "product_id", "quantity",
+    "original_price", "discount_applied", "channel", "channel_campaigns",
+    "product_name", "category", "brand", "color", "size", "catalog_price",
+    "cost_price", "customer_id", "gender", "age_range", "signup_date",
+    "first_name", "last_name", "email", "country",
+]
+
+# Low-cardinality text columns, read as categoricals so each chunk stores
+# small integer codes instead of one Python string per row.
+CATEGORY_COLUMNS = [
+    "channel", "channel_campaigns", "category", "brand", "color", "size",
+    "gender", "age_range", "country",
+]
+
+SOURCE_DTYPES = {
+    "sale_date": str, "item_id": "int64", "sale_id": "int64",
+    "product_id": "int64", "quantity": "int64", "original_price": "float64",
+    "discount_applied": "float64", "product_name": str,
+    "catalog_price": "float64", "cost_price": "float64",
+    "customer_id": "int64", "signup_date": str, "first_name": str,
+    "last_name": str, "email": str,
+    **{col: "category" for col in CATEGORY_COLUMNS},
+}
+
+DIMENSION_COLUMNS = {
+    "countries": {"country": "country_name"},
+    "categories": {"category": "category_name"},
+    "brands": {"brand": "brand_name"},
+    "colors": {"color": "color_name"},
+    "sizes": {"size": "size_label"},
+    "age_ranges": {"age_range": "age_range_label"},
+    "channels": {"channel": "channel_name", "channel_campaigns": "campaign_name"},
+}
+
+CUSTOMER_COLUMNS = [
+    "customer_id", "first_name", "last_name", "email", "gender",
+    "age_range", "signup_date", "country",
+]
+PRODUCT_COLUMNS = [
+    "product_id", "product_name", "category", "brand", "color",
+    "size", "catalog_price", "cost_price",
+]
+SALE_COLUMNS = ["sale_id", "sale_date", "customer_id", "channel"]
+SALE_ITEM_COLUMNS = [
+    "item_id", "sale_id", "product_id", "quantity",
+    "original_price", "discount_applied",
+]
+
+# Columns an upsert may rewrite on an existing row; their hash is stored
+# alongside the row so unchanged rows can be skipped.
+HASH_COLUMNS = {
+    "customers": ["first_name", "last_name", "email"],
+    "products": ["catalog_price", "cost_price"],
+}
+
+
+def row_hashes(df, columns):
+    canonical = [
+        df[col].astype(object).where(df[col].notna(), "\0").astype(str).tolist()
+        for col in columns
+    ]
+    hashes = [
+        hashlib.md5("\x1f".join(values).encode()).hexdigest()
+        for values in zip(*canonical)
+    ]
+    return pd.Series(hashes, index=df.index, dtype=str)
+
+
+def first_rows(df, keys, columns):
+    # duplicated() factorizes the key once; categorical keys reuse their codes
+    return df.loc[~df.duplicated(subset=keys), columns]
+
+
+def decode_categories(df, extra=None):
+    dtypes = {
+        col: df[col].cat.categories.dtype
+        for col in df.columns
+        if isinstance(df[col].dtype, pd.CategoricalDtype)
+    }
+    dtypes.update(extra or {})
+    return df.astype(dtypes)
+
+
+def split_dimensions(df):
+    tables = {}
+    for table, columns in DIMENSION_COLUMNS.items():
+        keys = list(columns)
+        tables[table] = decode_categories(first_rows(df, keys, keys)).rename(columns=columns)
+    tables["sizes"] = tables["sizes"].astype({"size_label": str})
+    return tables
+
+
+def transform_and_split(df, target_date, single_day=False):
+    with track_stage("transform", rows_in=len(df)) as stage:
+        tables = split_tables(df, target_date, single_day)
+        stage["rows_out"] = 0 if tables is None else len(tables["sale_items"])
+    return tables
+
+
+def split_tables(df, target_date, single_day=False):
+    # single_day: the caller hands over rows of target_date only (a
+    # partition_by_date part or a date-filtered read), so sale_date is not
+    # parsed again
+    if single_day:
+        if df.empty:
+            return None
+        day = df
+    else:
+        mask = pd.to_datetime(df["sale_date"]) == pd.Timestamp(target_date)
+        if not mask.any():
+            return None
+        day = df if mask.all() else df[mask]
+    logger.info(f"{len(day)} rows matched {target_date}")
+
+    tables = split_dimensions(day)
+
+    customers = decode_categories(first_rows(day, ["customer_id"], CUSTOMER_COLUMNS))
+    products = decode_categories(first_rows(day, ["product_id"], PRODUCT_COLUMNS), {"size": str})
+    customers["row_hash"] = row_hashes(customers, HASH_COLUMNS["customers"])
+    products["row_hash"] = row_hashes(products, HASH_COLUMNS["products"])
+
+    sales = decode_categories(first_rows(day, ["sale_id"], SALE_COLUMNS))
+    sales["sale_date"] = pd.to_datetime(sales["sale_date"]).dt.date
+
+    # Partition key of sale_items, the same for every row of the day
+    sale_items = day[SALE_ITEM_COLUMNS]
+    sale_items.insert(2, "sale_date", pd.Timestamp(target_date).date())
+
+    tables.update({
         "customers": customers,
         "products": products,
         "sales": sales,
         "sale_items": sale_items,
+    })
+    return tables
+
+
+def concat_frames(parts):
+    # pd.concat falls back to object when chunk categories differ
+    categorical = [
+        col for col in parts[0].columns
+        if isinstance(parts[0][col].dtype, pd.CategoricalDtype)
+    ]
+    merged = {
+        col: union_categoricals([part[col] for part in parts], ignore_order=True)
+        for col in categorical
     }
+    df = pd.concat(parts, ignore_index=True)
+    for col, values in merged.items():
+        df[col] = values
+    return df
+
+
+def partition_by_date(df):
+    sale_dates = pd.to_datetime(df["sale_date"])
+    return {day.date(): part for day, part in df.groupby(sale_dates, sort=True)}
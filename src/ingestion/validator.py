@@ -0,0 +1,188 @@
+import json
+import os
+
+import pandas as pd
+
+from ..utils.logger import setup_logger
+from ..utils.metrics import track_stage
+
+logger = setup_logger(__name__)
+
+# Constraints of the DKNF schema (sql/01_create_dknf_tables.sql), checked on
+# whole columns before the load so PostgreSQL never rejects a row mid-transaction.
+GENDERS = ["Female", "Male", "Other"]
+
+REQUIRED_COLUMNS = {
+    "countries": ["country_name"],
+    "categories": ["category_name"],
+    "brands": ["brand_name"],
+    "colors": ["color_name"],
+    "sizes": ["size_label"],
+    "age_ranges": ["age_range_label"],
+    "channels": ["channel_name"],
+    "customers": ["customer_id", "age_range", "country"],
+    "products": [
+        "product_id", "product_name", "category", "brand", "color", "size",
+        "catalog_price", "cost_price",
+    ],
+    "sales": ["sale_id", "sale_date", "customer_id", "channel"],
+    "sale_items": [
+        "item_id", "sale_id", "sale_date", "product_id", "quantity",
+        "original_price", "discount_applied",
+    ],
+}
+
+MAX_LENGTHS = {
+    "countries": {"country_name": 100},
+    "categories": {"category_name": 100},
+    "brands": {"brand_name": 100},
+    "colors": {"color_name": 50},
+    "sizes": {"size_label": 10},
+    "age_ranges": {"age_range_label": 20},
+    "channels": {"channel_name": 50, "campaign_name": 100},
+    "customers": {"first_name": 100, "last_name": 100, "email": 255, "age_range": 20, "country": 100},
+    "products": {"product_name": 255, "category": 100, "brand": 100, "color": 50, "size": 10},
+    "sales": {"channel": 50},
+}
+
+INTEGER_COLUMNS = {
+    "customers": ["customer_id"],
+    "products": ["product_id"],
+    "sales": ["sale_id", "customer_id"],
+    "sale_items": ["item_id", "sale_id", "product_id", "quantity"],
+}
+
+# NUMERIC(10, 2)
+NUMERIC_COLUMNS = {
+    "products": ["catalog_price", "cost_price"],
+    "sale_items": ["original_price", "discount_applied"],
+}
+NUMERIC_LIMIT = 10 ** 8
+INTEGER_LIMIT = 2 ** 31
+
+# Foreign keys, as columns of the split tables: a row whose parent was
+# rejected is rejected too. Tables are checked parents first.
+REFERENCES = {
+    "customers": {"age_range": ("age_ranges", "age_range_label"), "country": ("countries", "country_name")},
+    "products": {
+        "category": ("categories", "category_name"),
+        "brand": ("brands", "brand_name"),
+        "color": ("colors", "color_name"),
+        "size": ("sizes", "size_label"),
+    },
+    "sales": {"customer_id": ("customers", "customer_id"), "channel": ("channels", "channel_name")},
+    "sale_items": {"sale_id": ("sales", "sale_id"), "product_id": ("products", "product_id")},
+}
+
+ROW_KEYS = {table: columns[0] for table, columns in REQUIRED_COLUMNS.items()}
+
+REJECT_UPSERT_SQL = (
+    "INSERT INTO rejected_rows (sale_date, table_name, row_key, rules, payload) "
+    "SELECT d, t, k, r, p::jsonb FROM unnest(%s::date[], %s::text[], %s::text[], %s::text[], %s::text[]) "
+    "AS x(d, t, k, r, p) "
+    "ON CONFLICT (sale_date, table_name, row_key) DO UPDATE SET "
+    "rules = EXCLUDED.rules, payload = EXCLUDED.payload, rejected_at = now()"
+)
+
+REJECT_COLUMNS = ["sale_date", "table_name", "row_key", "rules", "payload"]
+
+
+def validate_before_load():
+    return os.getenv("VALIDATE_BEFORE_LOAD", "1") == "1"
+
+
+def too_long(values, limit):
+    return values.astype("string").str.len().gt(limit).fillna(False).astype(bool)
+
+
+def out_of_range(values, limit):
+    return values.notna() & ~values.abs().lt(limit)
+
+
+def rule_masks(table, df, clean):
+    masks = {}
+    for col in REQUIRED_COLUMNS.get(table, []):
+        masks[f"{col}_missing"] = df[col].isna()
+    for col, limit in MAX_LENGTHS.get(table, {}).items():
+        masks[f"{col}_too_long"] = too_long(df[col], limit)
+    for col in INTEGER_COLUMNS.get(table, []):
+        masks[f"{col}_out_of_range"] = out_of_range(df[col], INTEGER_LIMIT)
+    for col in NUMERIC_COLUMNS.get(table, []):
+        masks[f"{col}_out_of_range"] = out_of_range(df[col], NUMERIC_LIMIT)
+
+    if table == "customers":
+        masks["gender_invalid"] = df["gender"].notna() & ~df["gender"].isin(GENDERS)
+        signup = pd.to_datetime(df["signup_date"], errors="coerce")
+        masks["signup_date_invalid"] = df["signup_date"].notna() & signup.isna()
+    if table == "sale_items":
+        masks["quantity_not_positive"] = df["quantity"].le(0)
+
+    for col, (parent, parent_col) in REFERENCES.get(table, {}).items():
+        if parent in clean:
+            masks[f"{col}_unknown"] = df[col].notna() & ~df[col].isin(clean[parent][parent_col])
+
+    return pd.DataFrame(masks, index=df.index)
+
+
+def reject_frame(table, rejected, rules, batch_date):
+    payload = rejected.astype(object).where(rejected.notna(), None).to_dict("records")
+    dates = rejected["sale_date"] if "sale_date" in rejected else batch_date
+    return pd.DataFrame({
+        "sale_date": dates,
+        "table_name": table,
+        "row_key": rejected[ROW_KEYS[table]].astype(str),
+        "rules": rules,
+        "payload": [json.dumps(row, default=str) for row in payload],
+    }, columns=REJECT_COLUMNS)
+
+
+def check_tables(tables):
+    clean = {}
+    rejects = []
+    batch_date = min(tables["sales"]["sale_date"], default=None) if "sales" in tables else None
+
+    # Dimensions first, then customers and products, sales, sale_items
+    for table in REQUIRED_COLUMNS:
+        if table not in tables:
+            continue
+        df = tables[table]
+        masks = rule_masks(table, df, clean)
+        failed = masks.any(axis=1)
+        if not failed.any():
+            clean[table] = df
+            continue
+
+        # "a,b," per row from the matrix of failed rules
+        rules = masks[failed].dot(masks.columns + ",").str.rstrip(",")
+        rejects.append(reject_frame(table, df[failed], rules, batch_date))
+        clean[table] = df[~failed]
+        logger.warning(
+            f"{table}: {int(failed.sum())} rows rejected "
+            f"({', '.join(f'{rule} {count}' for rule, count in masks.sum().items() if count)})"
+        )
+
+    for table, df in tables.items():
+        clean.setdefault(table, df)
+    if not rejects:
+        return clean, pd.DataFrame(columns=REJECT_COLUMNS)
+    return clean, pd.concat(rejects, ignore_index=True)
+
+
+def validate_tables(tables):
+    with track_stage("validate", rows_in=sum(len(df) for df in tables.values())) as stage:
+        clean, rejects = check_tables(tables)
+        stage["rows_out"] = sum(len(df) for df in clean.values())
+    return clean, rejects
+
+
+def record_rejects(cur, rejects):
+    # A retried load rewrites its rejects instead of duplicating them. Rejects
+    # without a date come from dimension-only loads; the daily loads that
+    # follow reject the same rows with their date.
+    rejects = rejects.dropna(subset=["sale_date"]).drop_duplicates(
+        subset=["sale_date", "table_name", "row_key"]
+    )
+    if rejects.empty:
+        return
+    cur.execute(REJECT_UPSERT_SQL, tuple(rejects[col].tolist() for col in REJECT_COLUMNS))
+    logger.info(f"{len(rejects)} rejected rows quarantined in rejected_rows")
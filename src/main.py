@@ -1,11 +1,16 @@
+import os
 import sys
 import argparse
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
 
-from .ingestion.minio_client import read_csv_from_minio
-from .ingestion.transformer import transform_and_split
-from .ingestion.postgres_loader import load_to_postgres
+from .ingestion.manifest import head_source, pending_dates, record_empty
+from .ingestion.minio_client import get_s3_client, read_source
+from .ingestion.pipeline import ingest_prefix
+from .ingestion.transformer import partition_by_date, split_dimensions, transform_and_split
+from .ingestion.postgres_loader import LOAD_MODES, load_dimensions, load_to_postgres
 from .utils.logger import setup_logger
+from .utils.metrics import drain_records, extend_records, publish_metrics
 
 logger = setup_logger("main")
 
@@ -19,30 +24,228 @@ def parse_date(date_str):
         )
 
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser(description="Ingestion des ventes fashion store")
-    parser.add_argument("date", type=parse_date, help="Date de vente à ingérer (YYYYMMDD)")
-    args = parser.parse_args()
+    parser.add_argument(
+        "dates",
+        nargs="*",
+        type=parse_date,
+        help="Date(s) de vente à ingérer (YYYYMMDD)",
+    )
+    parser.add_argument(
+        "--from",
+        dest="date_from",
+        type=parse_date,
+        help="Début de la plage à ingérer, inclus (YYYYMMDD)",
+    )
+    parser.add_argument(
+        "--to",
+        dest="date_to",
+        type=parse_date,
+        help="Fin de la plage à ingérer, incluse (YYYYMMDD)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("INGEST_WORKERS", "4")),
+        help="Nombre de jours traités en parallèle (defaut: INGEST_WORKERS ou 4)",
+    )
+    parser.add_argument(
+        "--load-mode",
+        choices=LOAD_MODES,
+        default=None,
+        help="Mode de chargement PostgreSQL (defaut: PG_LOAD_MODE ou copy)",
+    )
+    parser.add_argument(
+        "--prefix",
+        default=os.getenv("MINIO_PREFIX"),
+        help="Ingère tous les CSV sous ce préfixe du bucket au lieu de MINIO_CSV_KEY",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Recharge les dates déjà chargées depuis la même version de la source",
+    )
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="Remplace les ventes déjà chargées pour ces dates au lieu de les compléter",
+    )
+    return parser
+
+
+def resolve_dates(parser, args):
+    dates = {d.date() for d in args.dates}
+
+    if args.date_from or args.date_to:
+        if not (args.date_from and args.date_to):
+            parser.error("--from et --to doivent être utilisés ensemble")
+        if args.date_from > args.date_to:
+            parser.error("--from doit précéder --to")
+        day = args.date_from.date()
+        while day <= args.date_to.date():
+            dates.add(day)
+            day += timedelta(days=1)
+
+    if args.prefix is not None and args.replace:
+        parser.error("--replace ne peut pas être combiné avec --prefix")
+    if not dates and args.prefix is None:
+        parser.error("Indiquer au moins une date ou une plage --from/--to")
+    if args.workers < 1:
+        parser.error("--workers doit être >= 1")
+    return sorted(dates)
+
+
+def plan_source(s3, dates, force=False, csv_key=None):
+    bucket = os.getenv("MINIO_BUCKET", "folder-source")
+    csv_key = csv_key or os.getenv("MINIO_CSV_KEY", "fashion_store_sales.csv")
+
+    source = head_source(s3, bucket, csv_key)
+    if force:
+        return source, dates
+    return source, pending_dates(source, dates)
+
+
+def ingest_day(target_date, df, load_mode=None, replace=False, source=None):
+    # Every caller hands over one day: a partition or a date-filtered read
+    tables = transform_and_split(df, target_date, single_day=True)
+    if tables is None:
+        return 0
 
-    target_date = args.date.date()
+    logger.info(f"{len(tables['sale_items'])} articles à charger pour {target_date}")
+    load_to_postgres(tables, mode=load_mode, replace=replace, source=source)
+    return len(tables["sale_items"])
+
+
+def ingest_day_worker(target_date, df, load_mode=None, replace=False, source=None):
+    # Forked workers inherit the parent's records; only ship back their own
+    drain_records()
+    loaded = ingest_day(target_date, df, load_mode, replace, source)
+    return loaded, drain_records()
+
+
+def run_single(target_date, load_mode, replace=False, force=False):
     logger.info(f"Ingestion démarrée pour {target_date}")
 
     try:
-        df = read_csv_from_minio()
+        s3 = get_s3_client()
+        source, pending = plan_source(s3, [target_date], force or replace)
+        if not pending:
+            logger.info(
+                f"{target_date} déjà chargé depuis cette version de la source, "
+                f"rien à faire (--force pour recharger)"
+            )
+            return 0
+
+        df = read_source(s3, source["bucket"], source["key"], target_date)
         logger.info(f"{len(df)} lignes lues depuis Minio")
 
-        tables = transform_and_split(df, target_date)
-        if tables is None:
+        loaded = ingest_day(target_date, df, load_mode, replace, source)
+        if loaded == 0:
             logger.warning(f"Aucune donnée pour {target_date}")
-            sys.exit(0)
+            record_empty(source, [target_date])
+            return 0
 
-        logger.info(f"{len(tables['sale_items'])} articles à charger")
-        load_to_postgres(tables)
         logger.info("Ingestion terminee avec succes")
+        return 0
 
     except Exception as e:
         logger.error(f"Echec de l'ingestion: {e}", exc_info=True)
-        sys.exit(1)
+        return 1
+
+
+def run_backfill(dates, load_mode, workers, replace=False, force=False):
+    logger.info(f"Backfill démarré pour {len(dates)} jours ({dates[0]} -> {dates[-1]})")
+
+    try:
+        s3 = get_s3_client()
+        source, pending = plan_source(s3, dates, force or replace)
+        skipped = len(dates) - len(pending)
+        if not pending:
+            logger.info("Tous les jours demandés sont déjà chargés depuis cette version de la source")
+            return 0
+        dates = pending
+
+        df = read_source(s3, source["bucket"], source["key"], dates)
+        logger.info(f"{len(df)} lignes lues depuis Minio")
+        if df.empty:
+            logger.warning("Aucune donnée sur la plage demandée")
+            record_empty(source, dates)
+            return 0
+
+        load_dimensions(split_dimensions(df), mode=load_mode)
+        partitions = partition_by_date(df)
+    except Exception as e:
+        logger.error(f"Echec de la préparation du backfill: {e}", exc_info=True)
+        return 1
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(partitions))) as pool:
+        futures = {
+            pool.submit(ingest_day_worker, day, part, load_mode, replace, source): day
+            for day, part in partitions.items()
+        }
+        for future in as_completed(futures):
+            day = futures[future]
+            try:
+                results[day], records = future.result()
+                extend_records(records)
+                logger.info(f"{day}: {results[day]} articles chargés")
+            except Exception as e:
+                results[day] = e
+                logger.error(f"{day}: échec de l'ingestion: {e}")
+
+    failed = [day for day, result in results.items() if isinstance(result, Exception)]
+    empty = [day for day in dates if day not in results]
+    for day in empty:
+        logger.warning(f"{day}: aucune donnée")
+    try:
+        record_empty(source, empty)
+    except Exception as e:
+        logger.error(f"Echec de l'enregistrement des jours sans donnée: {e}")
+
+    logger.info(
+        f"Backfill terminé: {len(results) - len(failed)} jours chargés, "
+        f"{len(failed)} en échec, {len(empty)} sans donnée, {skipped} déjà chargés"
+    )
+    if failed:
+        logger.error(f"Jours en échec: {', '.join(str(d) for d in sorted(failed))}")
+        return 1
+    return 0
+
+
+def run_prefix(prefix, dates, load_mode, force=False):
+    bucket = os.getenv("MINIO_BUCKET", "folder-source")
+    logger.info(f"Ingestion des objets sous s3://{bucket}/{prefix}")
+
+    try:
+        results = ingest_prefix(get_s3_client(), bucket, prefix, dates or None, load_mode, force=force)
+    except Exception as e:
+        logger.error(f"Echec de l'ingestion du préfixe: {e}", exc_info=True)
+        return 1
+
+    failed = [batch for batch, result in results.items() if isinstance(result, Exception)]
+    logger.info(
+        f"Préfixe terminé: {len(results) - len(failed)} lots (objet, jour) chargés, "
+        f"{len(failed)} en échec"
+    )
+    return 1 if failed else 0
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    dates = resolve_dates(parser, args)
+
+    if args.prefix is not None:
+        code = run_prefix(args.prefix, dates, args.load_mode, args.force)
+    elif len(dates) == 1:
+        code = run_single(dates[0], args.load_mode, args.replace, args.force)
+    else:
+        code = run_backfill(dates, args.load_mode, args.workers, args.replace, args.force)
+
+    publish_metrics({"runner": "cli", "task": "ingestion"}, success=code == 0)
+    sys.exit(code)
 
 
 if __name__ == "__main__":
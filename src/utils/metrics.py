@@ -0,0 +1,204 @@
+import os
+import resource
+import threading
+import time
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+metrics_logger = setup_logger("metrics", json_format=True)
+
+METRIC_PREFIX = "fashion_ingestion"
+
+# (suffix, record field, help) of the per-stage gauges
+STAGE_METRICS = [
+    ("stage_duration_seconds", "duration_seconds", "Wall-clock time spent in the stage"),
+    ("stage_rows_in", "rows_in", "Rows received by the stage"),
+    ("stage_rows_out", "rows_out", "Rows produced or written by the stage"),
+    ("stage_bytes_read", "bytes_read", "Bytes read from the object store"),
+    ("stage_db_round_trips", "db_round_trips", "Statements sent to PostgreSQL"),
+    ("stage_download_seconds", "download_seconds", "Time spent waiting on object store reads"),
+    ("stage_filter_seconds", "filter_seconds", "Time spent applying the sale_date predicate"),
+    ("stage_errors", "errors", "Stage executions that raised"),
+    ("stage_rss_bytes", "rss_bytes", "Resident memory of the process at stage end"),
+]
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# Open stages are tracked per thread, so stages running concurrently in a
+# pipeline do not count each other's reads and statements.
+lock = threading.Lock()
+local = threading.local()
+stage_records = []
+
+
+def active_stages():
+    if not hasattr(local, "stages"):
+        local.stages = []
+    return local.stages
+
+
+def peak_rss_bytes():
+    # High-water mark of the whole process: never goes down between stages
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_rss_bytes():
+    # Resident memory right now (Linux); None where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return None
+
+
+@contextmanager
+def track_stage(stage, table="", rows_in=None):
+    record = {
+        "stage": stage,
+        "table": table,
+        "rows_in": rows_in,
+        "rows_out": None,
+        "bytes_read": 0,
+        "db_round_trips": 0,
+    }
+    active_stages().append(record)
+    start = time.perf_counter()
+    try:
+        yield record
+        record["status"] = "ok"
+    except Exception:
+        record["status"] = "error"
+        raise
+    finally:
+        record["duration_seconds"] = round(time.perf_counter() - start, 6)
+        record["rss_bytes"] = current_rss_bytes()
+        record["process_peak_rss_bytes"] = peak_rss_bytes()
+        active_stages().remove(record)
+        with lock:
+            stage_records.append(record)
+        metrics_logger.info(record)
+
+
+def increment(field, amount=1):
+    for record in active_stages():
+        record[field] = (record.get(field) or 0) + amount
+
+
+def drain_records():
+    with lock:
+        records = list(stage_records)
+        stage_records.clear()
+    return records
+
+
+def extend_records(records):
+    with lock:
+        stage_records.extend(records)
+
+
+class CountingReader:
+    def __init__(self, body):
+        self.body = body
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self.body.read(size)
+        increment("download_seconds", time.perf_counter() - start)
+        increment("bytes_read", len(data))
+        return data
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    pairs = (f'{key}="{escape_label(value)}"' for key, value in sorted(labels.items()))
+    return "{" + ",".join(pairs) + "}"
+
+
+def render_prometheus(records, labels, success):
+    totals = {}
+    for record in records:
+        key = (record["stage"], record["table"])
+        total = totals.setdefault(key, {"errors": 0})
+        for _, field, _ in STAGE_METRICS:
+            value = record.get(field)
+            if field == "errors":
+                total["errors"] += record.get("status") == "error"
+            elif field == "rss_bytes":
+                if value is not None:
+                    total[field] = max(total.get(field, 0), value)
+            elif value is not None:
+                total[field] = total.get(field, 0) + value
+
+    lines = []
+    for suffix, field, help_text in STAGE_METRICS:
+        name = f"{METRIC_PREFIX}_{suffix}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for (stage, table), total in sorted(totals.items()):
+            if field in total:
+                series = format_labels({**labels, "stage": stage, "table": table})
+                lines.append(f"{name}{series} {total[field]}")
+
+    run_labels = format_labels(labels)
+    process_peak = max((record.get("process_peak_rss_bytes") or 0 for record in records), default=0)
+    lines += [
+        f"# HELP {METRIC_PREFIX}_process_peak_rss_bytes Peak resident memory of the process over the run",
+        f"# TYPE {METRIC_PREFIX}_process_peak_rss_bytes gauge",
+        f"{METRIC_PREFIX}_process_peak_rss_bytes{run_labels} {max(process_peak, peak_rss_bytes())}",
+        f"# HELP {METRIC_PREFIX}_run_success 1 if the last run succeeded",
+        f"# TYPE {METRIC_PREFIX}_run_success gauge",
+        f"{METRIC_PREFIX}_run_success{run_labels} {int(success)}",
+        f"# HELP {METRIC_PREFIX}_run_timestamp_seconds End time of the last run",
+        f"# TYPE {METRIC_PREFIX}_run_timestamp_seconds gauge",
+        f"{METRIC_PREFIX}_run_timestamp_seconds{run_labels} {time.time():.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(directory, labels, body):
+    os.makedirs(directory, exist_ok=True)
+    name = "_".join([METRIC_PREFIX, *(str(v) for _, v in sorted(labels.items()))])
+    path = os.path.join(directory, f"{name}.prom")
+    with open(f"{path}.tmp", "w") as f:
+        f.write(body)
+    os.replace(f"{path}.tmp", path)
+    logger.info(f"Metrics written to {path}")
+
+
+def push_to_gateway(url, labels, body):
+    grouping = "".join(
+        f"/{key}/{urllib.parse.quote(str(value), safe='')}" for key, value in sorted(labels.items())
+    )
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/metrics/job/{METRIC_PREFIX}{grouping}",
+        data=body.encode(),
+        method="PUT",
+        headers={"Content-Type": "text/plain; version=0.0.4"},
+    )
+    with urllib.request.urlopen(request, timeout=10):
+        pass
+    logger.info(f"Metrics pushed to {url}")
+
+
+def publish_metrics(labels, success=True):
+    records = drain_records()
+    body = render_prometheus(records, labels, success)
+
+    directory = os.getenv("METRICS_TEXTFILE_DIR")
+    if directory:
+        write_textfile(directory, labels, body)
+
+    gateway = os.getenv("METRICS_PUSHGATEWAY_URL")
+    if gateway:
+        try:
+            push_to_gateway(gateway, labels, body)
+        except OSError as e:
+            logger.warning(f"Metrics push to {gateway} failed: {e}")
+    return body
@@ -0,0 +1,286 @@
+import os
+import sys
+import select
+import signal
+import argparse
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+
+from .main import ingest_day, parse_date, plan_source
+from .ingestion.manifest import record_empty
+from .ingestion.minio_client import get_s3_client, read_source
+from .ingestion.postgres_loader import LOAD_MODES, connection_params
+from .ingestion.transformer import partition_by_date
+from .utils.logger import setup_logger
+from .utils.metrics import publish_metrics
+
+logger = setup_logger("worker")
+
+JOB_CHANNEL = "ingestion_jobs"
+
+ENQUEUE_SQL = (
+    "INSERT INTO ingestion_jobs (sale_dates, source_key, load_mode, force) "
+    "VALUES (%s::date[], %s, %s, %s) RETURNING job_id"
+)
+
+# SKIP LOCKED: several workers can share the queue without taking the same job.
+# A running job whose heartbeat is older than the lease lost its worker
+# (killed, OOM, restart) and is claimed again.
+CLAIM_SQL = (
+    "UPDATE ingestion_jobs j SET status = 'running', started_at = now(), heartbeat_at = now() "
+    "FROM ("
+    "SELECT job_id, status FROM ingestion_jobs "
+    "WHERE status = 'queued' "
+    "OR (status = 'running' AND heartbeat_at < now() - make_interval(secs => %s)) "
+    "ORDER BY job_id FOR UPDATE SKIP LOCKED LIMIT 1"
+    ") AS claimed WHERE j.job_id = claimed.job_id "
+    "RETURNING j.job_id, j.sale_dates, j.source_key, j.load_mode, j.force, "
+    "extract(epoch FROM j.started_at - j.queued_at), claimed.status = 'running'"
+)
+
+HEARTBEAT_SQL = (
+    "UPDATE ingestion_jobs SET heartbeat_at = now() WHERE job_id = %s AND status = 'running'"
+)
+
+FINISH_SQL = (
+    "UPDATE ingestion_jobs SET status = %s, rows_loaded = %s, error = %s, finished_at = now() "
+    "WHERE job_id = %s"
+)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Worker d'ingestion des ventes fashion store")
+    parser.add_argument(
+        "--enqueue",
+        nargs="+",
+        type=parse_date,
+        metavar="DATE",
+        help="Ajoute un job pour ces dates (YYYYMMDD) au lieu de lancer le worker",
+    )
+    parser.add_argument(
+        "--key",
+        default=None,
+        help="Objet source du job (defaut: MINIO_CSV_KEY)",
+    )
+    parser.add_argument(
+        "--load-mode",
+        choices=LOAD_MODES,
+        default=None,
+        help="Mode de chargement PostgreSQL du job (defaut: PG_LOAD_MODE ou copy)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Recharge les dates déjà chargées depuis la même version de la source",
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=float(os.getenv("WORKER_POLL_SECONDS", "5")),
+        help="Délai max entre deux recherches de jobs, en secondes (defaut: WORKER_POLL_SECONDS ou 5)",
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=float(os.getenv("WORKER_LEASE_SECONDS", "300")),
+        help="Délai sans heartbeat après lequel un job en cours est repris, en secondes "
+             "(defaut: WORKER_LEASE_SECONDS ou 300)",
+    )
+    return parser
+
+
+def enqueue_job(conn, dates, source_key=None, load_mode=None, force=False):
+    with conn.cursor() as cur:
+        cur.execute(ENQUEUE_SQL, (sorted(dates), source_key, load_mode, force))
+        job_id = cur.fetchone()[0]
+    conn.commit()
+    return job_id
+
+
+def claim_job(conn, lease_seconds):
+    with conn.cursor() as cur:
+        cur.execute(CLAIM_SQL, (lease_seconds,))
+        row = cur.fetchone()
+    if row is None:
+        return None
+    job_id, dates, source_key, load_mode, force, waited, reclaimed = row
+    return {
+        "job_id": job_id,
+        "dates": sorted(dates),
+        "source_key": source_key,
+        "load_mode": load_mode,
+        "force": force,
+        "waited": float(waited),
+        "reclaimed": reclaimed,
+    }
+
+
+def finish_job(conn, job_id, status, rows_loaded=None, error=None):
+    with conn.cursor() as cur:
+        cur.execute(FINISH_SQL, (status, rows_loaded, error, job_id))
+
+
+@contextmanager
+def heartbeat(job_id, interval):
+    # Own connection: the listening one is idle while the job runs, and a
+    # beat must not wait for the load's transaction
+    stop = threading.Event()
+
+    def beat():
+        conn = None
+        while not stop.wait(interval):
+            try:
+                if conn is None:
+                    conn = psycopg2.connect(**connection_params())
+                    conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(HEARTBEAT_SQL, (job_id,))
+            except psycopg2.Error as e:
+                logger.warning(f"Heartbeat du job {job_id} en échec: {e}")
+                if conn is not None:
+                    conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(s3, job):
+    source, pending = plan_source(s3, job["dates"], job["force"], job["source_key"])
+    if not pending:
+        logger.info(f"Job {job['job_id']}: dates déjà chargées, rien à faire")
+        return 0
+
+    df = read_source(s3, source["bucket"], source["key"], pending)
+    partitions = partition_by_date(df)
+    loaded = sum(
+        ingest_day(day, part, job["load_mode"], source=source) for day, part in partitions.items()
+    )
+    record_empty(source, [day for day in pending if day not in partitions])
+    return loaded
+
+
+def wait_for_jobs(conn, timeout, stop):
+    # Woken by NOTIFY; the timeout also catches jobs queued while we were busy
+    if select.select([conn], [], [], timeout)[0] and not stop.is_set():
+        conn.poll()
+        conn.notifies.clear()
+
+
+def connect_listener():
+    conn = psycopg2.connect(**connection_params())
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {JOB_CHANNEL}")
+    return conn
+
+
+def reconnect(conn, poll_seconds, stop):
+    conn.close()
+    while not stop.is_set():
+        try:
+            return connect_listener()
+        except psycopg2.Error as e:
+            logger.error(f"Reconnexion à PostgreSQL impossible: {e}")
+            stop.wait(poll_seconds)
+    return None
+
+
+def run_worker(poll_seconds, lease_seconds):
+    # Loads borrow pooled connections instead of reconnecting for each job
+    os.environ["PG_KEEP_CONNECTIONS"] = "1"
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    s3 = get_s3_client()
+    conn = connect_listener()
+    logger.info(f"Worker prêt, en attente de jobs sur le canal {JOB_CHANNEL}")
+
+    try:
+        while not stop.is_set():
+            try:
+                job = claim_job(conn, lease_seconds)
+                if job is None:
+                    wait_for_jobs(conn, poll_seconds, stop)
+                    continue
+            except psycopg2.Error as e:
+                # Postgres restarted or failed over while the worker was idle
+                logger.error(f"Connexion d'écoute perdue: {e}")
+                conn = reconnect(conn, poll_seconds, stop)
+                if conn is None:
+                    break
+                continue
+
+            logger.info(
+                f"Job {job['job_id']} {'repris après expiration du bail' if job['reclaimed'] else 'démarré'}: "
+                f"{len(job['dates'])} dates, {job['waited']:.2f}s d'attente"
+            )
+            start = time.perf_counter()
+            try:
+                with heartbeat(job["job_id"], lease_seconds / 3):
+                    loaded = run_job(s3, job)
+                logger.info(
+                    f"Job {job['job_id']} terminé: {loaded} articles chargés "
+                    f"en {time.perf_counter() - start:.2f}s"
+                )
+                status, rows_loaded, error = "done", loaded, None
+            except Exception as e:
+                logger.error(
+                    f"Job {job['job_id']} en échec après {time.perf_counter() - start:.2f}s: {e}",
+                    exc_info=True,
+                )
+                status, rows_loaded, error = "failed", None, str(e)
+
+            try:
+                finish_job(conn, job["job_id"], status, rows_loaded=rows_loaded, error=error)
+            except psycopg2.Error as db_error:
+                # Lost connection: the job stays running without heartbeat
+                # and is claimed again once its lease expires; a load already
+                # committed is then skipped through the manifest
+                logger.error(f"Job {job['job_id']}: statut {status} non enregistré: {db_error}")
+                conn = reconnect(conn, poll_seconds, stop)
+            publish_metrics({"runner": "worker", "task": "ingestion"}, success=status == "done")
+            if conn is None:
+                break
+    finally:
+        if conn is not None:
+            conn.close()
+    logger.info("Worker arrêté")
+    return 0
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.poll <= 0:
+        parser.error("--poll doit être > 0")
+    if args.lease <= 0:
+        parser.error("--lease doit être > 0")
+
+    if args.enqueue:
+        conn = psycopg2.connect(**connection_params())
+        try:
+            dates = {d.date() for d in args.enqueue}
+            job_id = enqueue_job(conn, dates, args.key, args.load_mode, args.force)
+        finally:
+            conn.close()
+        logger.info(f"Job {job_id} ajouté pour {len(dates)} dates")
+        sys.exit(0)
+
+    sys.exit(run_worker(args.poll, args.lease))
+
+
+if __name__ == "__main__":
+    main()